@@ -1,3 +1,34 @@
-from daps_ui.poster_renamerr import PosterRenamerr, Server, Media, Radarr, Sonarr
-from daps_ui.config import *
-from daps_ui.utils import *
\ No newline at end of file
+import importlib
+
+# Public names and the module they live in. They are imported on first access,
+# so "import daps_ui" does not pull in the Plex and arr clients.
+_EXPORTS = {
+    "PosterRenamerr": "daps_ui.poster_renamerr",
+    "Server": "daps_ui.poster_renamerr",
+    "Media": "daps_ui.poster_renamerr",
+    "Radarr": "daps_ui.poster_renamerr",
+    "Sonarr": "daps_ui.poster_renamerr",
+    "MediaCatalog": "daps_ui.catalog",
+    "MediaItem": "daps_ui.catalog",
+    "MetadataCache": "daps_ui.metadata_cache",
+    "Config": "daps_ui.config",
+    "INSTANCE_TIMEOUT": "daps_ui.config",
+    "INSTANCE_RETRIES": "daps_ui.config",
+    "TimeoutSession": "daps_ui.utils",
+    "SessionPool": "daps_ui.utils",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str) -> object:
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,3 @@
+from daps_ui.cli import main
+
+main()
@@ -0,0 +1,440 @@
+"""
+Benchmark the poster_renamerr stages on a synthetic library.
+
+Generates movies, shows (with seasons and specials), collections and source
+posters in a temporary directory, feeds them through in-process Radarr,
+Sonarr and Plex stand-ins, and times every stage. Results are printed and
+can be written as JSON to compare runs across commits:
+
+    python -m daps_ui.benchmark --movies 20000 --output before.json
+    python -m daps_ui.benchmark --movies 20000 --compare before.json
+
+--catalog-only skips the posters and measures building the media catalog
+and what is derived from it, e.g. for a 100k-title library:
+
+    python -m daps_ui.benchmark --catalog-only --movies 80000 --shows 15000 \
+        --collections 5000 --match-ratio 1
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from daps_ui.catalog import MediaCatalog
+from daps_ui.matching import MatchIndex, sanitize_name
+from daps_ui.pipeline import StreamingPipeline
+from daps_ui.poster_renamerr import PosterRenamerr, Radarr, Server, Sonarr
+
+BENCHMARK_VERSION = 2
+PROC_IO = Path("/proc/self/io")
+
+
+def generate_library(
+    root: Path,
+    movies: int = 2000,
+    shows: int = 500,
+    seasons: int = 3,
+    collections: int = 200,
+    match_ratio: float = 0.8,
+    sources: int = 2,
+    duplicate_ratio: float = 0.1,
+    poster_size: int = 16 * 1024,
+    seed: int = 0,
+    write_posters: bool = True,
+) -> dict:
+    """
+    Write synthetic source posters under root and return the media the
+    stand-in instances should report.
+
+    Every title gets posters, but only match_ratio of the titles are kept in
+    the returned library, so the other posters do not match. Posters are
+    spread over the source directories, and duplicate_ratio of them are
+    repeated in a lower-priority directory. With write_posters=False only
+    the media is generated.
+    """
+    rng = random.Random(seed)
+    source_dirs = [root / f"source_{index}" for index in range(sources)]
+    for source_dir in source_dirs:
+        source_dir.mkdir(parents=True, exist_ok=True)
+
+    library = {"movies": [], "series": [], "collections": []}
+    posters = []
+    for index in range(movies):
+        title = f"Synthetic Movie {index:06d} ({1950 + index % 70})"
+        posters.append(title)
+        if rng.random() < match_ratio:
+            library["movies"].append(f"/media/movies/{title}")
+    for index in range(shows):
+        title = f"Synthetic Show {index:06d} ({1980 + index % 40})"
+        posters.append(title)
+        posters.extend(f"{title} - Season {season}" for season in range(1, seasons + 1))
+        posters.append(f"{title} - Specials")
+        if rng.random() < match_ratio:
+            library["series"].append(f"/media/shows/{title} {{tvdb-{index + 1}}}")
+    for index in range(collections):
+        title = f"Synthetic Saga {index:05d}"
+        posters.append(title)
+        if rng.random() < match_ratio:
+            library["collections"].append(title)
+
+    library["source_directories"] = [str(source_dir) for source_dir in source_dirs]
+    library["posters"] = len(posters)
+    if not write_posters:
+        return library
+
+    payload = bytes(rng.getrandbits(8) for _ in range(min(poster_size, 4096)))
+    payload = (payload * (poster_size // len(payload) + 1))[:poster_size]
+    for index, name in enumerate(posters):
+        source_dir = source_dirs[index % sources]
+        (source_dir / f"{name}.jpg").write_bytes(index.to_bytes(8, "big") + payload)
+        if sources > 1 and rng.random() < duplicate_ratio:
+            (source_dirs[-1] / f"{name}.jpg").write_bytes(payload)
+    return library
+
+
+def stand_in_instances(library: dict) -> tuple[dict, dict, dict]:
+    """
+    Radarr, Sonarr and Plex instances built from cached data, so nothing
+    touches the network.
+    """
+    radarr = Radarr.from_cache({"movies": library["movies"]})
+    sonarr = Sonarr.from_cache({"series": library["series"]})
+    plex = Server.from_cache(
+        {
+            "libraries": {
+                "Movies": {
+                    "type": "movie",
+                    "collections": {
+                        str(index): title
+                        for index, title in enumerate(library["collections"])
+                    },
+                    "synced_at": 0,
+                }
+            }
+        }
+    )
+    return {"radarr": radarr}, {"sonarr": sonarr}, {"plex": plex}
+
+
+def _read_io() -> dict[str, int]:
+    try:
+        with open(PROC_IO) as file:
+            return {
+                key: int(value)
+                for key, value in (line.split(": ") for line in file)
+                if key in ("rchar", "wchar", "syscr", "syscw")
+            }
+    except OSError:
+        return {}
+
+
+class StageTimer:
+    """
+    Collects wall time, read/write syscalls and bytes (from /proc/self/io,
+    where available) and optionally the Python allocation peak and the
+    memory still allocated at the end of each stage.
+    """
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.stages: list[dict] = []
+
+    @contextlib.contextmanager
+    def stage(self, name: str, quiet: bool = True):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            memory_before = tracemalloc.get_traced_memory()[0]
+        io_before = _read_io()
+        started = time.perf_counter()
+        with open(os.devnull, "w") as devnull:
+            with contextlib.ExitStack() as stack:
+                if quiet:
+                    stack.enter_context(contextlib.redirect_stdout(devnull))
+                    stack.enter_context(contextlib.redirect_stderr(devnull))
+                yield
+        result = {"stage": name, "seconds": round(time.perf_counter() - started, 6)}
+        io_after = _read_io()
+        result.update(
+            {
+                key: io_after[key] - io_before[key]
+                for key in io_after
+                if key in io_before
+            }
+        )
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            result["peak_python_bytes"] = peak
+            result["retained_python_bytes"] = current - memory_before
+        self.stages.append(result)
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(
+    root: Path,
+    library_options: dict,
+    asset_folders: bool = True,
+    pipeline_mode: str = "batch",
+    copy_workers: int | None = None,
+    placement: str = "auto",
+    trace_memory: bool = False,
+) -> dict:
+    """
+    Generate a library under root and run a first (copying) and a second
+    (unchanged) pass over it, timing each stage.
+    """
+    timer = StageTimer(trace_memory)
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        with timer.stage("generate"):
+            library = generate_library(root, **library_options)
+        for run in ("first", "second"):
+            renamer = PosterRenamerr(
+                root / "assets",
+                library["source_directories"],
+                asset_folders,
+                root / "cache.json",
+                copy_workers=copy_workers,
+                placement=placement,
+            )
+            with timer.stage(f"{run}.instances"):
+                radarr, sonarr, plex = stand_in_instances(library)
+            with timer.stage(f"{run}.catalog"):
+                catalog = MediaCatalog.from_instances(radarr, sonarr, plex)
+            asset_folder_names = None
+            if asset_folders:
+                with timer.stage(f"{run}.create_asset_directories"):
+                    asset_folder_names = renamer.create_asset_directories(catalog)
+            if pipeline_mode == "stream":
+                with timer.stage(f"{run}.stream"):
+                    pipeline = StreamingPipeline(renamer, catalog, asset_folder_names)
+                    pipeline.run()
+                    renamer.prune_cache_sources(pipeline.source_file_paths)
+            else:
+                with timer.stage(f"{run}.get_source_files"):
+                    source_files = renamer.get_source_files()
+                with timer.stage(f"{run}.match_files_with_media"):
+                    matched_files = renamer.match_files_with_media(
+                        source_files, catalog
+                    )
+                with timer.stage(f"{run}.plan"):
+                    plan = renamer.plan(
+                        matched_files,
+                        asset_folder_names,
+                        source_files,
+                    )
+                with timer.stage(f"{run}.apply"):
+                    renamer.apply_plan(plan)
+            renamer.cache.close()
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+    return {
+        "benchmark": "poster_renamerr",
+        "version": BENCHMARK_VERSION,
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": {
+            **library_options,
+            "asset_folders": asset_folders,
+            "pipeline_mode": pipeline_mode,
+            "copy_workers": copy_workers,
+            "placement": placement,
+        },
+        "posters": library["posters"],
+        "stages": timer.stages,
+        "max_rss_kb": (
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None
+        ),
+    }
+
+
+def run_catalog_benchmark(root: Path, library_options: dict) -> dict:
+    """
+    Build the media catalog, match index and asset folder names of a
+    generated library without posters. The build runs twice, once to time
+    it and once tracing the memory each stage keeps allocated, as tracing
+    slows it down.
+    """
+    library = generate_library(root, **library_options, write_posters=False)
+    renamer = PosterRenamerr(root / "assets", [], True, root / "cache.json")
+    timers = []
+    try:
+        for trace_memory in (False, True):
+            sanitize_name.cache_clear()
+            timer = StageTimer(trace_memory)
+            if trace_memory:
+                tracemalloc.start()
+            try:
+                with timer.stage("instances"):
+                    radarr, sonarr, plex = stand_in_instances(library)
+                with timer.stage("catalog"):
+                    catalog = MediaCatalog.from_instances(radarr, sonarr, plex)
+                with timer.stage("match_index"):
+                    match_index = MatchIndex(catalog)
+                with timer.stage("create_asset_directories"):
+                    asset_folder_names = renamer.create_asset_directories(
+                        catalog, dry_run=True
+                    )
+            finally:
+                if trace_memory:
+                    tracemalloc.stop()
+            timers.append(timer)
+            titles = len(catalog)
+            del radarr, sonarr, plex, catalog, match_index, asset_folder_names
+    finally:
+        renamer.cache.close()
+    stages = timers[0].stages
+    for stage, traced in zip(stages, timers[1].stages):
+        stage["peak_python_bytes"] = traced["peak_python_bytes"]
+        stage["retained_python_bytes"] = traced["retained_python_bytes"]
+
+    return {
+        "benchmark": "catalog",
+        "version": BENCHMARK_VERSION,
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": library_options,
+        "titles": titles,
+        "stages": stages,
+        "max_rss_kb": (
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None
+        ),
+    }
+
+
+def print_results(results: dict, baseline: dict | None = None) -> None:
+    baseline_stages = {
+        stage["stage"]: stage for stage in (baseline or {}).get("stages", [])
+    }
+    if "titles" in results:
+        summary = f"{results['titles']} titles, commit {results['commit']}"
+    else:
+        summary = f"{results['posters']} posters, commit {results['commit']}"
+    if results["max_rss_kb"]:
+        summary += f", peak RSS {results['max_rss_kb'] / 1024:.0f} MiB"
+    print(summary)
+    for stage in results["stages"]:
+        line = f"{stage['stage']:<36}{stage['seconds']:>10.3f}s"
+        if "syscr" in stage:
+            line += (
+                f"{stage['syscr']:>10} reads{stage['rchar'] / 1024 / 1024:>10.1f} MiB"
+            )
+        if "peak_python_bytes" in stage:
+            line += f"{stage['peak_python_bytes'] / 1024 / 1024:>10.1f} MiB peak"
+            line += f"{stage['retained_python_bytes'] / 1024 / 1024:>10.1f} MiB kept"
+        previous = baseline_stages.get(stage["stage"])
+        if previous and previous["seconds"]:
+            change = (stage["seconds"] - previous["seconds"]) / previous["seconds"]
+            line += f"  {change:+.1%} vs {baseline.get('commit')}"
+        print(line)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark poster_renamerr on a synthetic library"
+    )
+    parser.add_argument("--movies", type=int, default=2000)
+    parser.add_argument("--shows", type=int, default=500)
+    parser.add_argument("--seasons", type=int, default=3)
+    parser.add_argument("--collections", type=int, default=200)
+    parser.add_argument("--match-ratio", type=float, default=0.8)
+    parser.add_argument("--sources", type=int, default=2)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.1)
+    parser.add_argument("--poster-size", type=int, default=16 * 1024)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--flat", action="store_true", help="copy without asset folders"
+    )
+    parser.add_argument("--pipeline", choices=("batch", "stream"), default="batch")
+    parser.add_argument("--copy-workers", type=int)
+    parser.add_argument("--placement", default="auto")
+    parser.add_argument(
+        "--catalog-only",
+        action="store_true",
+        help="only build the media catalog, match index and asset folder names, tracing their memory",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="report the Python allocation peak per stage (slows every stage down)",
+    )
+    parser.add_argument(
+        "--dir", help="directory for the library (default: a temporary one)"
+    )
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument(
+        "--compare", help="JSON results of an earlier run to compare with"
+    )
+    args = parser.parse_args(argv)
+
+    library_options = {
+        "movies": args.movies,
+        "shows": args.shows,
+        "seasons": args.seasons,
+        "collections": args.collections,
+        "match_ratio": args.match_ratio,
+        "sources": args.sources,
+        "duplicate_ratio": args.duplicate_ratio,
+        "poster_size": args.poster_size,
+        "seed": args.seed,
+    }
+    with contextlib.ExitStack() as stack:
+        if args.dir:
+            root = Path(args.dir)
+        else:
+            root = Path(stack.enter_context(tempfile.TemporaryDirectory()))
+        if args.catalog_only:
+            results = run_catalog_benchmark(root, library_options)
+        else:
+            results = run_benchmark(
+                root,
+                library_options,
+                asset_folders=not args.flat,
+                pipeline_mode=args.pipeline,
+                copy_workers=args.copy_workers,
+                placement=args.placement,
+                trace_memory=args.trace_memory,
+            )
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+    print_results(results, baseline)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,373 @@
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+CACHE_BATCH_SIZE = 500
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend(ABC):
+    """
+    Storage for the copied_files cache. Backends only see whole batches of
+    changes, so they can write them in a single transaction.
+    """
+
+    @abstractmethod
+    def load(self) -> dict[str, dict]:
+        pass
+
+    @abstractmethod
+    def write(self, upserts: dict[str, dict], deletes: set[str]) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class JsonCacheBackend(CacheBackend):
+    """
+    Keeps the cache in a single JSON file, replaced atomically on every write.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._entries: dict[str, dict] = {}
+
+    def load(self) -> dict[str, dict]:
+        self._entries = load_json_cache(self.path)
+        return dict(self._entries)
+
+    def write(self, upserts: dict[str, dict], deletes: set[str]) -> None:
+        for target_path in deletes:
+            self._entries.pop(target_path, None)
+        self._entries.update(upserts)
+        write_json_atomic(self.path, {"copied_files": self._entries}, indent=4)
+
+
+class SqliteCacheBackend(CacheBackend):
+    """
+    Keeps the cache in SQLite (WAL mode), one row per target path. An existing
+    JSON cache is imported the first time the database is opened.
+
+    With read_only, nothing is created, imported or written. A database
+    without a write-ahead log (closed cleanly) is opened as immutable, so not
+    even the -wal and -shm files are created next to it; one with a log is
+    opened with mode=ro, which has to read it.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        legacy_json_path: Path | None = None,
+        read_only: bool = False,
+    ):
+        self.path = Path(path)
+        self.legacy_json_path = legacy_json_path
+        if read_only:
+            wal_path = self.path.with_name(f"{self.path.name}-wal")
+            query = "mode=ro" if wal_path.exists() else "immutable=1"
+            self.connection = sqlite3.connect(
+                f"{self.path.resolve().as_uri()}?{query}",
+                uri=True,
+                check_same_thread=False,
+            )
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS copied_files "
+                "(target_path TEXT PRIMARY KEY, data TEXT NOT NULL)"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+            )
+        self._import_legacy_json()
+
+    def _import_legacy_json(self) -> None:
+        if not self.legacy_json_path or not self.legacy_json_path.exists():
+            return
+        imported = self.connection.execute(
+            "SELECT value FROM meta WHERE key = 'imported_json'"
+        ).fetchone()
+        if imported:
+            return
+        entries = load_json_cache(self.legacy_json_path)
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO copied_files (target_path, data) VALUES (?, ?)",
+                ((path, json.dumps(data)) for path, data in entries.items()),
+            )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('imported_json', ?)",
+                (str(self.legacy_json_path),),
+            )
+        logger.info(
+            "Imported %s cache entries from %s", len(entries), self.legacy_json_path
+        )
+
+    def load(self) -> dict[str, dict]:
+        rows = self.connection.execute("SELECT target_path, data FROM copied_files")
+        return {target_path: json.loads(data) for target_path, data in rows}
+
+    def write(self, upserts: dict[str, dict], deletes: set[str]) -> None:
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM copied_files WHERE target_path = ?",
+                ((path,) for path in deletes),
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO copied_files (target_path, data) VALUES (?, ?)",
+                ((path, json.dumps(data)) for path, data in upserts.items()),
+            )
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class CopyCache:
+    """
+    In-memory copied_files map (target path -> hash, source_path, ...) that
+    persists changes to a backend in batches instead of after every file.
+    Updates are serialized with a lock so copy workers can share one cache.
+
+    A reverse index (source path -> target paths) is kept alongside, so the
+    targets of a deleted or renamed source are found without going through
+    every entry or walking the target directory. A second one (size -> target
+    paths) finds targets that may hold the same content as a new source.
+    """
+
+    def __init__(self, backend: CacheBackend, batch_size: int = CACHE_BATCH_SIZE):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.copied_files = backend.load()
+        self._targets_by_source: dict[str, set[str]] = {}
+        self._targets_by_size: dict[int, set[str]] = {}
+        for target_path, entry in self.copied_files.items():
+            self._index(target_path, entry)
+        self._upserts: dict[str, dict] = {}
+        self._deletes: set[str] = set()
+        self._lock = threading.RLock()
+
+    def _index(self, target_path: str, entry: dict) -> None:
+        self._targets_by_source.setdefault(entry["source_path"], set()).add(target_path)
+        if entry.get("fingerprint"):
+            self._targets_by_size.setdefault(entry["fingerprint"][0], set()).add(
+                target_path
+            )
+
+    def _unindex(self, target_path: str, entry: dict) -> None:
+        _discard(self._targets_by_source, entry["source_path"], target_path)
+        if entry.get("fingerprint"):
+            _discard(self._targets_by_size, entry["fingerprint"][0], target_path)
+
+    def targets_for(self, source_path: str) -> set[str]:
+        """
+        Target paths copied from source_path.
+        """
+        with self._lock:
+            return set(self._targets_by_source.get(source_path, ()))
+
+    def hash_for_source(
+        self, source_path: str, fingerprint: list[int], algorithm: str
+    ) -> str | None:
+        """
+        The hash recorded for source_path by any of its targets, if the
+        source is unchanged since (same fingerprint and algorithm).
+        """
+        with self._lock:
+            for target_path in self._targets_by_source.get(source_path, ()):
+                entry = self.copied_files[target_path]
+                if (
+                    entry.get("fingerprint") == fingerprint
+                    and entry.get("algorithm") == algorithm
+                ):
+                    return entry["hash"]
+        return None
+
+    def has_size(self, size: int) -> bool:
+        """
+        Whether any target was copied from a source of this size.
+        """
+        with self._lock:
+            return size in self._targets_by_size
+
+    def duplicates_of(self, size: int, algorithm: str, content_hash: str) -> list[str]:
+        """
+        Target paths recorded with the given size and content hash.
+        """
+        with self._lock:
+            return [
+                target_path
+                for target_path in self._targets_by_size.get(size, ())
+                if self.copied_files[target_path]["hash"] == content_hash
+                and self.copied_files[target_path].get("algorithm") == algorithm
+            ]
+
+    def sources(self) -> set[str]:
+        """
+        Every source path that has at least one target in the cache.
+        """
+        with self._lock:
+            return set(self._targets_by_source)
+
+    def stats(self) -> dict[str, int]:
+        """
+        Entry, source and content counts, with the bytes recorded for all
+        targets and for the targets that repeat content another one holds.
+        """
+        with self._lock:
+            total_bytes = 0
+            contents = {}
+            for entry in self.copied_files.values():
+                if not entry.get("fingerprint"):
+                    continue
+                total_bytes += entry["fingerprint"][0]
+                content = (entry.get("algorithm"), entry["hash"])
+                contents.setdefault(content, []).append(entry["fingerprint"][0])
+            return {
+                "entries": len(self.copied_files),
+                "sources": len(self._targets_by_source),
+                "contents": len(contents),
+                "bytes": total_bytes,
+                "duplicate_bytes": sum(
+                    sum(sizes) - sizes[0] for sizes in contents.values()
+                ),
+            }
+
+    def get(self, target_path: str) -> dict | None:
+        return self.copied_files.get(target_path)
+
+    def set(self, target_path: str, entry: dict) -> None:
+        with self._lock:
+            previous = self.copied_files.get(target_path)
+            if previous is not None:
+                self._unindex(target_path, previous)
+            self.copied_files[target_path] = entry
+            self._index(target_path, entry)
+            self._upserts[target_path] = entry
+            self._deletes.discard(target_path)
+            self._maybe_commit()
+
+    def remove(self, target_path: str) -> None:
+        with self._lock:
+            entry = self.copied_files.pop(target_path, None)
+            if entry is None:
+                return
+            self._unindex(target_path, entry)
+            self._upserts.pop(target_path, None)
+            self._deletes.add(target_path)
+            self._maybe_commit()
+
+    def items(self):
+        return self.copied_files.items()
+
+    def __len__(self) -> int:
+        return len(self.copied_files)
+
+    def __contains__(self, target_path: str) -> bool:
+        return target_path in self.copied_files
+
+    @property
+    def pending(self) -> int:
+        return len(self._upserts) + len(self._deletes)
+
+    def _maybe_commit(self) -> None:
+        if self.pending >= self.batch_size:
+            self.commit()
+
+    def commit(self) -> None:
+        with self._lock:
+            if not self.pending:
+                return
+            self.backend.write(self._upserts, self._deletes)
+            self._upserts = {}
+            self._deletes = set()
+
+    def close(self) -> None:
+        with self._lock:
+            self.commit()
+            self.backend.close()
+
+
+def _discard(index: dict, key: object, target_path: str) -> None:
+    targets = index.get(key)
+    if targets is None:
+        return
+    targets.discard(target_path)
+    if not targets:
+        del index[key]
+
+
+def write_json_atomic(path: Path, data: object, indent: int | None = None) -> None:
+    """
+    Write data as JSON to a temporary file next to path and rename it into
+    place, so readers never see a partially written file.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=path.parent, prefix=f".{path.name}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w") as file:
+            json.dump(data, file, indent=indent)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+def load_json_cache(path: Path) -> dict[str, dict]:
+    """
+    Read the copied_files map from a JSON cache file, ignoring a missing or
+    truncated file.
+    """
+    try:
+        with open(path, "r") as file:
+            return json.load(file).get("copied_files", {})
+    except FileNotFoundError:
+        return {}
+    except json.JSONDecodeError as e:
+        logger.warning("Ignoring unreadable cache file %s: %s", path, e)
+        return {}
+
+
+def create_cache(
+    cache_file: str | Path,
+    backend: str = "sqlite",
+    batch_size: int = CACHE_BATCH_SIZE,
+    read_only: bool = False,
+) -> CopyCache:
+    """
+    Open the copy cache for cache_file using the "sqlite" or "json" backend.
+
+    The SQLite database lives next to cache_file with a .db suffix and imports
+    cache_file the first time it is created. A read_only cache, for dry runs
+    and inspection, never creates or imports anything: without a database,
+    the JSON cache file is read directly.
+    """
+    cache_file = Path(cache_file)
+    if backend == "json":
+        return CopyCache(JsonCacheBackend(cache_file), batch_size)
+    if backend == "sqlite":
+        if cache_file.suffix == ".db":
+            db_path, legacy_json_path = cache_file, None
+        else:
+            db_path, legacy_json_path = cache_file.with_suffix(".db"), cache_file
+        if read_only and not db_path.exists():
+            return CopyCache(JsonCacheBackend(cache_file), batch_size)
+        return CopyCache(
+            SqliteCacheBackend(db_path, legacy_json_path, read_only), batch_size
+        )
+    raise ValueError(f"Unknown cache backend: {backend}")
@@ -0,0 +1,88 @@
+import sys
+from typing import Iterable, Iterator
+
+from daps_ui.matching import parse_title_key
+
+MEDIA_KINDS = ("collections", "movies", "shows")
+
+
+class MediaItem:
+    """
+    One movie, show or collection: its folder name (the title, for a
+    collection), normalized title, year, tvdb/imdb/tmdb IDs and kind.
+    """
+
+    __slots__ = ("name", "title", "year", "ids", "kind")
+
+    def __init__(
+        self,
+        name: str,
+        title: str,
+        year: int | None,
+        ids: tuple[tuple[str, str], ...],
+        kind: str,
+    ):
+        self.name = name
+        self.title = title
+        self.year = year
+        self.ids = ids
+        self.kind = kind
+
+    def __repr__(self) -> str:
+        return f"MediaItem({self.kind!r}, {self.name!r})"
+
+
+class MediaCatalog:
+    """
+    Every collection, movie and show the instances report, once per kind and
+    name however many instances report it, in the order first seen. Built
+    once per run and shared by the matcher and create_asset_directories.
+
+    Items are __slots__ records holding only what matching and asset folders
+    need, with names interned so they are shared with the instance lists and
+    titles parsed once instead of once per consumer.
+    """
+
+    def __init__(self):
+        self.items: dict[str, dict[str, MediaItem]] = {kind: {} for kind in MEDIA_KINDS}
+        self._years: dict[int, int] = {}
+
+    @classmethod
+    def from_instances(
+        cls,
+        radarr_instances: dict[str, object],
+        sonarr_instances: dict[str, object],
+        plex_instances: dict[str, object],
+    ) -> "MediaCatalog":
+        catalog = cls()
+        for plex in plex_instances.values():
+            catalog.update("collections", plex.movie_collections)
+            catalog.update("collections", plex.series_collections)
+        for radarr in radarr_instances.values():
+            catalog.update("movies", radarr.movies)
+        for sonarr in sonarr_instances.values():
+            catalog.update("shows", sonarr.series)
+        return catalog
+
+    def add(self, kind: str, name: str) -> MediaItem:
+        items = self.items[kind]
+        item = items.get(name)
+        if item is None:
+            name = sys.intern(name)
+            key = parse_title_key(name, collection=kind == "collections")
+            year = key.year
+            if year is not None:
+                year = self._years.setdefault(year, year)
+            item = items[name] = MediaItem(name, key.title, year, key.ids, kind)
+        return item
+
+    def update(self, kind: str, names: Iterable[str]) -> None:
+        for name in names:
+            self.add(kind, name)
+
+    def __iter__(self) -> Iterator[MediaItem]:
+        for items in self.items.values():
+            yield from items.values()
+
+    def __len__(self) -> int:
+        return sum(map(len, self.items.values()))
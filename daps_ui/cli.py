@@ -0,0 +1,431 @@
+"""
+Command line interface of poster_renamerr:
+
+    daps-ui run [--watch | --service]
+    daps-ui dry-run
+    daps-ui cache stats
+    daps-ui cache prune [--dry-run]
+    daps-ui benchmark [benchmark options]
+
+Only run and dry-run contact Radarr, Sonarr and Plex, and the client libraries
+are imported when they do, so the cache and benchmark commands start without
+them. Paths are relative to the working directory unless configured.
+"""
+
+import argparse
+import logging
+import os
+import signal
+import sys
+from pathlib import Path
+
+from daps_ui.cache import create_cache
+from daps_ui.catalog import MediaCatalog
+from daps_ui.config import Config
+from daps_ui.matching import FUZZY_CUTOFF
+from daps_ui.metadata_cache import MetadataCache
+from daps_ui.pipeline import PIPELINE_QUEUE_SIZE, StreamingPipeline
+from daps_ui.poster_renamerr import PosterRenamerr, Radarr, Server, Sonarr
+from daps_ui.watcher import POLL_INTERVAL, WATCH_DEBOUNCE, PosterWatcher
+
+SCRIPT_NAME = "poster_renamerr"
+CONFIG_PATH = Path("config") / "config.yaml"
+CACHE_FILE = Path("cache.json")
+# Where the cache was kept before the paths were portable: cache.json on
+# Windows, but a file literally named ".\\cache.json" everywhere else.
+LEGACY_CACHE_FILE = Path(r".\\cache.json")
+
+logger = logging.getLogger(__name__)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="daps-ui", description="Match and copy posters into the asset directory"
+    )
+    parser.add_argument(
+        "--config",
+        type=Path,
+        default=CONFIG_PATH,
+        help=f"config file (default: {CONFIG_PATH})",
+    )
+    # The flags of the old single command still work without a subcommand.
+    for flag in ("--watch", "--dry-run", "--service"):
+        parser.add_argument(
+            flag,
+            action="store_true",
+            dest="legacy_" + flag[2:].replace("-", "_"),
+            help=argparse.SUPPRESS,
+        )
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+
+    run_parser = subparsers.add_parser("run", help="match and copy posters")
+    mode = run_parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep running and process changed source posters as they appear",
+    )
+    mode.add_argument(
+        "--service",
+        action="store_true",
+        help="keep running, run on a schedule and when triggered over HTTP",
+    )
+    subparsers.add_parser(
+        "dry-run",
+        help="print what would be copied, replaced, skipped and deleted without changing anything",
+    )
+
+    cache_parser = subparsers.add_parser("cache", help="inspect or prune the caches")
+    cache_commands = cache_parser.add_subparsers(
+        dest="cache_command", metavar="command", required=True
+    )
+    cache_commands.add_parser("stats", help="show what the caches hold")
+    prune_parser = cache_commands.add_parser(
+        "prune",
+        help="forget copies whose target is gone and remove unused optimized posters",
+    )
+    prune_parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="only report what would be pruned",
+    )
+
+    subparsers.add_parser(
+        "benchmark",
+        add_help=False,
+        help="benchmark on a synthetic library (see benchmark --help)",
+    )
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if args.command == "benchmark":
+        from daps_ui import benchmark
+
+        return benchmark.main(extra)
+    if extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    if args.command is None:
+        args.command = "dry-run" if args.legacy_dry_run else "run"
+        args.watch = args.legacy_watch
+        args.service = args.legacy_service
+
+    config = Config(SCRIPT_NAME, config_path=args.config)
+    if getattr(config, "script_config", None) is None:
+        sys.exit(f"No {SCRIPT_NAME} settings in {args.config}")
+    log_level = (config.script_config.get("log_level") or "INFO").upper()
+    logging.basicConfig(level=log_level, format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.command == "cache":
+        if args.cache_command == "stats":
+            cache_stats(config)
+        else:
+            cache_prune(config, args.dry_run)
+    elif args.command == "dry-run":
+        run(config, dry_run=True)
+    elif args.service:
+        run_service(config)
+    else:
+        run(config, watch=args.watch)
+
+
+def run_service(config: Config) -> None:
+    from daps_ui.service import PosterService
+
+    service = PosterService(
+        config,
+        lambda config, sessions: run(config, sessions=sessions),
+        interval=config.script_config.get("service_interval"),
+        host=config.script_config.get("service_host"),
+        port=config.script_config.get("service_port"),
+        token=config.script_config.get("service_token"),
+    )
+    signal.signal(signal.SIGTERM, lambda signum, frame: service.stop())
+    try:
+        service.run()
+    except KeyboardInterrupt:
+        pass
+
+
+def cache_file_path(config: Config, migrate: bool = True) -> Path:
+    """
+    The configured cache file, after moving a cache left at the legacy path
+    to the default one. Without migrate, nothing is moved and a cache still
+    at the legacy path is read from there.
+    """
+    cache_file = config.script_config.get("cache_file")
+    if cache_file:
+        return Path(cache_file)
+    for suffix in (".json", ".db"):
+        legacy = LEGACY_CACHE_FILE.with_suffix(suffix)
+        current = CACHE_FILE.with_suffix(suffix)
+        if legacy.exists() and not current.exists():
+            if not migrate:
+                return LEGACY_CACHE_FILE
+            os.replace(legacy, current)
+            logger.info("Moved cache from %s to %s", legacy, current)
+    return CACHE_FILE
+
+
+def run(
+    config: Config,
+    dry_run: bool = False,
+    watch: bool = False,
+    sessions: object | None = None,
+) -> None:
+    cache_file = cache_file_path(config, migrate=not dry_run)
+    source_directory = config.script_config.get("source_directories")
+    target_directory = config.script_config.get("target_directory")
+    asset_folders = config.script_config.get("asset_folders")
+    verify_hashes = bool(config.script_config.get("verify_hashes"))
+    hash_buffer_size = config.script_config.get("hash_buffer_size")
+    cache_backend = config.script_config.get("cache_backend") or "sqlite"
+    copy_workers = config.script_config.get("copy_workers")
+    recursive_scan = bool(config.script_config.get("recursive_scan"))
+    placement = config.script_config.get("placement") or "auto"
+    hash_algorithm = config.script_config.get("hash_algorithm")
+    remove_orphans = bool(config.script_config.get("remove_orphaned_posters"))
+    dedupe = bool(config.script_config.get("dedupe"))
+    fuzzy_cutoff = None
+    if config.script_config.get("fuzzy_matching"):
+        fuzzy_cutoff = config.script_config.get("fuzzy_cutoff") or FUZZY_CUTOFF
+    optimizer = None
+    if config.script_config.get("optimize_posters"):
+        from daps_ui import optimize
+
+        settings = optimize.OptimizeSettings(
+            config.script_config.get("optimize_format") or optimize.OPTIMIZE_FORMAT,
+            config.script_config.get("optimize_quality") or optimize.OPTIMIZE_QUALITY,
+            config.script_config.get("optimize_max_width")
+            or optimize.OPTIMIZE_MAX_WIDTH,
+            config.script_config.get("optimize_max_height")
+            or optimize.OPTIMIZE_MAX_HEIGHT,
+        )
+        optimizer = optimize.PosterOptimizer(
+            settings,
+            config.script_config.get("optimize_cache_dir"),
+            config.script_config.get("optimize_workers"),
+            hash_algorithm or "sha256",
+        )
+    renamer = PosterRenamerr(
+        target_directory,
+        source_directory,
+        asset_folders,
+        cache_file,
+        verify_hashes,
+        hash_buffer_size,
+        cache_backend,
+        copy_workers,
+        recursive_scan,
+        placement,
+        hash_algorithm,
+        remove_orphans,
+        fuzzy_cutoff,
+        optimizer,
+        dedupe,
+        read_only=dry_run,
+    )
+    try:
+        sync(config, renamer, dry_run, watch, sessions)
+    finally:
+        if renamer.optimizer is not None:
+            renamer.optimizer.close()
+        renamer.cache.close()
+
+
+def sync(
+    config: Config,
+    renamer: PosterRenamerr,
+    dry_run: bool = False,
+    watch: bool = False,
+    sessions: object | None = None,
+) -> None:
+    asset_folders = renamer.asset_folders
+    metadata_cache_dir = (
+        config.script_config.get("metadata_cache_dir") or "metadata_cache"
+    )
+    metadata_cache = MetadataCache(
+        metadata_cache_dir, config.script_config.get("metadata_cache_ttl") or 0
+    )
+    with renamer.metrics.stage("instances"):
+        radarr_instances, sonarr_instances = config.create_arr_instances(
+            Radarr, Sonarr, metadata_cache, sessions
+        )
+        plex_instances = config.create_plex_instances(Server, metadata_cache, sessions)
+    with renamer.metrics.stage("catalog"):
+        catalog = MediaCatalog.from_instances(
+            radarr_instances, sonarr_instances, plex_instances
+        )
+    orphan_folders = config.script_config.get("orphan_asset_folders")
+    if orphan_folders == "prune" and config.failed_instances:
+        logger.warning(
+            "Not pruning orphaned asset folders, missing data from: %s",
+            ", ".join(sorted(config.failed_instances)),
+        )
+        orphan_folders = "report"
+    if renamer.remove_orphans and config.failed_instances:
+        logger.warning(
+            "Not removing orphaned posters, missing data from: %s",
+            ", ".join(sorted(config.failed_instances)),
+        )
+        renamer.remove_orphans = False
+    if dry_run:
+        asset_folder_names = None
+        if asset_folders:
+            asset_folder_names = renamer.create_asset_directories(
+                catalog, orphan_folders, dry_run=True
+            )
+        source_files = renamer.get_source_files()
+        matched_files = renamer.match_files_with_media(source_files, catalog)
+        plan = renamer.plan(
+            matched_files,
+            asset_folder_names,
+            source_files,
+            dry_run=True,
+        )
+        plan.describe()
+        print(f"Plan: {plan.summary()}")
+        return
+    if config.script_config.get("pipeline_mode") == "stream" and not watch:
+        asset_folder_names = None
+        if asset_folders:
+            asset_folder_names = renamer.create_asset_directories(
+                catalog, orphan_folders
+            )
+        queue_size = (
+            config.script_config.get("pipeline_queue_size") or PIPELINE_QUEUE_SIZE
+        )
+        pipeline = StreamingPipeline(renamer, catalog, asset_folder_names, queue_size)
+        pipeline.run()
+        renamer.prune_cache_sources(
+            pipeline.source_file_paths, pipeline.claimed_targets
+        )
+        write_metrics(renamer.metrics, config)
+        return
+    source_files = renamer.get_source_files()
+    matched_files = renamer.match_files_with_media(source_files, catalog)
+    asset_folder_names = None
+    if asset_folders:
+        asset_folder_names = renamer.create_asset_directories(catalog, orphan_folders)
+    plan = renamer.plan(matched_files, asset_folder_names, source_files)
+    renamer.apply_plan(plan)
+    write_metrics(renamer.metrics, config)
+    if watch:
+        watcher = PosterWatcher(
+            renamer,
+            asset_folder_names,
+            mode=config.script_config.get("watch_mode") or "auto",
+            debounce=config.script_config.get("watch_debounce") or WATCH_DEBOUNCE,
+            poll_interval=config.script_config.get("watch_poll_interval")
+            or POLL_INTERVAL,
+        )
+        try:
+            watcher.run()
+        except KeyboardInterrupt:
+            pass
+        write_metrics(renamer.metrics, config)
+
+
+def write_metrics(metrics: object, config: Config) -> None:
+    logger.info("Run summary: %s", metrics.summary())
+    metrics_json = config.script_config.get("metrics_json")
+    metrics_prometheus = config.script_config.get("metrics_prometheus")
+    try:
+        if metrics_json:
+            metrics.write_json(metrics_json)
+        if metrics_prometheus:
+            metrics.write_prometheus(metrics_prometheus)
+    except OSError as e:
+        logger.error("Failed to write metrics: %s", e)
+
+
+def cache_stats(config: Config) -> None:
+    cache = _open_cache(config, read_only=True)
+    if cache is not None:
+        try:
+            stats = cache.stats()
+        finally:
+            cache.close()
+        print(f"Copy cache: {cache.backend.path}")
+        print(f"  targets:    {stats['entries']}")
+        print(f"  sources:    {stats['sources']}")
+        print(f"  contents:   {stats['contents']}")
+        print(f"  size:       {_mib(stats['bytes'])}")
+        print(f"  duplicates: {_mib(stats['duplicate_bytes'])}")
+    for label, directory in (
+        ("Optimized posters", _optimize_cache_dir(config)),
+        ("Metadata cache", _metadata_cache_dir(config)),
+    ):
+        if directory.is_dir():
+            files, size = _dir_usage(directory)
+            print(f"{label}: {directory}, {files} files, {_mib(size)}")
+
+
+def cache_prune(config: Config, dry_run: bool = False) -> None:
+    """
+    Forget copies whose target no longer exists and remove optimized posters
+    that no copy uses any more. Source posters and targets are not touched.
+    Without a copy cache nothing is known to use the optimized posters, so
+    they are kept.
+    """
+    cache = _open_cache(config, read_only=dry_run)
+    if cache is None:
+        return
+    try:
+        missing = [
+            target_path
+            for target_path, _ in list(cache.items())
+            if not os.path.exists(target_path)
+        ]
+        if not dry_run:
+            for target_path in missing:
+                cache.remove(target_path)
+        sources = cache.sources()
+    finally:
+        cache.close()
+    verb = "Would forget" if dry_run else "Forgot"
+    print(f"{verb} {len(missing)} cache entries whose target is gone")
+
+    store_dir = _optimize_cache_dir(config)
+    if store_dir.is_dir():
+        from daps_ui import optimize
+
+        removed, removed_bytes = optimize.prune_store(store_dir, sources, dry_run)
+        verb = "Would remove" if dry_run else "Removed"
+        print(f"{verb} {removed} unused optimized posters ({_mib(removed_bytes)})")
+
+
+def _open_cache(config: Config, read_only: bool = False) -> object | None:
+    cache_file = cache_file_path(config, migrate=not read_only)
+    backend = config.script_config.get("cache_backend") or "sqlite"
+    if not cache_file.exists() and not cache_file.with_suffix(".db").exists():
+        print(f"No copy cache at {cache_file}")
+        return None
+    return create_cache(cache_file, backend, read_only=read_only)
+
+
+def _optimize_cache_dir(config: Config) -> Path:
+    # Same default as daps_ui.optimize, which is only imported when needed.
+    return Path(config.script_config.get("optimize_cache_dir") or "optimized_posters")
+
+
+def _metadata_cache_dir(config: Config) -> Path:
+    return Path(config.script_config.get("metadata_cache_dir") or "metadata_cache")
+
+
+def _dir_usage(directory: Path) -> tuple[int, int]:
+    files = size = 0
+    for root, _, names in os.walk(directory):
+        for name in names:
+            try:
+                size += os.stat(os.path.join(root, name)).st_size
+            except OSError:
+                continue
+            files += 1
+    return files, size
+
+
+def _mib(size: int) -> str:
+    return f"{size / 1024 / 1024:.1f} MiB"
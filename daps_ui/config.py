@@ -1,48 +1,201 @@
 import yaml
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
+from typing import Callable, NamedTuple
+from daps_ui.metadata_cache import MetadataCache
+
+INSTANCE_TIMEOUT = 30
+INSTANCE_RETRIES = 2
+
+logger = logging.getLogger(__name__)
+
+class InstanceLoader(NamedTuple):
+    instance_class: object
+    instance_config: dict
+    source: dict
+    kwargs: dict
+    incremental: bool = False
 
 class Config:
     def __init__(self, script_name: str, config_path: str):
         self.config_path = Path(config_path)
         self.script_name = script_name
+        self.failed_instances = set()
+        self.config_stat = None
+        self.load_config()
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reload the config file when its size or mtime changed since it was
+        last loaded. Returns True when it was reloaded.
+        """
+        try:
+            config_stat = self.config_path.stat()
+        except FileNotFoundError:
+            return False
+        if self.config_stat == (config_stat.st_size, config_stat.st_mtime_ns):
+            return False
         self.load_config()
+        return True
     
     def load_config(self):       
         try:
+            config_stat = self.config_path.stat()
             with open(self.config_path, 'r') as file:
                 config = yaml.safe_load(file)
         except FileNotFoundError:
-            print(f"Config file not found at {self.config_path}")
+            logger.error('Config file not found at %s', self.config_path)
             return
         except yaml.parser.ParserError as e:
-            print(f"Error parsing config file: {e}")
+            logger.error('Error parsing config file: %s', e)
             return      
         
+        self.config_stat = (config_stat.st_size, config_stat.st_mtime_ns)
         self.instances_config = config['instances']
         self.script_config = config.get(f"{self.script_name}")
         self.radarr_config = self.instances_config.get('radarr', {})
         self.sonarr_config = self.instances_config.get('sonarr', {})
         self.plex_config = self.instances_config.get('plex', {})
+        self.instance_timeout = self.script_config.get('instance_timeout') or INSTANCE_TIMEOUT
+        self.instance_retries = self.script_config.get('instance_retries')
+        if self.instance_retries is None:
+            self.instance_retries = INSTANCE_RETRIES
 
-    def create_arr_instances(self, radarr_class: object, sonarr_class: object) -> tuple[dict[str, list[object], dict[str, list[object]]]]:
-        radarr_instances = {}
-        sonarr_instances = {}
+    def create_arr_instances(self, radarr_class: object, sonarr_class: object, metadata_cache: MetadataCache | None = None, sessions: object | None = None) -> tuple[dict[str, list[object], dict[str, list[object]]]]:
+        radarr_loaders = {}
+        sonarr_loaders = {}
         for key, value in self.radarr_config.items():
             if key in self.script_config['instances']:
                 radarr_name = f'{key}'
-                radarr_instances[radarr_name] = radarr_class(base_url=value['url'], api=value['api'])
+                radarr_loaders[radarr_name] = self._arr_loader(radarr_name, radarr_class, value, sessions)
         for key, value in self.sonarr_config.items():
             if key in self.script_config['instances']:
                 sonarr_name = f'{key}'
-                sonarr_instances[sonarr_name] = sonarr_class(base_url=value['url'], api=value['api'])                
+                sonarr_loaders[sonarr_name] = self._arr_loader(sonarr_name, sonarr_class, value, sessions)
+        instances = self._create_instances({**radarr_loaders, **sonarr_loaders}, metadata_cache)
+        radarr_instances = {name: instances[name] for name in radarr_loaders if name in instances}
+        sonarr_instances = {name: instances[name] for name in sonarr_loaders if name in instances}
         return radarr_instances, sonarr_instances
     
-    def create_plex_instances(self, plex_class: object) -> dict[str, list[object]]:
-        plex_instances = {}
+    def create_plex_instances(self, plex_class: object, metadata_cache: MetadataCache | None = None, sessions: object | None = None) -> dict[str, list[object]]:
+        plex_loaders = {}
         library_names = self.script_config['library_names']
         for key, value in self.plex_config.items():
             if key in self.script_config['instances']:
                 plex_name = f'{key}'
-                plex_instances[plex_name] = plex_class(plex_url=value['url'], plex_token=value['api'], library_names=library_names)
-        return plex_instances
+                timeout = self._timeout(value)
+                plex_loaders[plex_name] = InstanceLoader(
+                    plex_class,
+                    value,
+                    {'url': value['url'], 'library_names': library_names},
+                    {
+                        'plex_url': value['url'],
+                        'plex_token': value['api'],
+                        'library_names': library_names,
+                        'timeout': timeout,
+                        'session': self._session(sessions, plex_name, value['url'], timeout),
+                    },
+                    incremental=True,
+                )
+        instances = self._create_instances(plex_loaders, metadata_cache)
+        for name, instance in instances.items():
+            for library_name in instance.failed_libraries:
+                # A library that could not be read has no collections, which
+                # must not be mistaken for all of them being deleted.
+                self.failed_instances.add(f'{name}: {library_name}')
+        return instances
+
+    def _arr_loader(self, name: str, instance_class: object, instance_config: dict, sessions: object | None) -> InstanceLoader:
+        timeout = self._timeout(instance_config)
+        return InstanceLoader(
+            instance_class,
+            instance_config,
+            {'url': instance_config['url']},
+            {
+                'base_url': instance_config['url'],
+                'api': instance_config['api'],
+                'timeout': timeout,
+                'session': self._session(sessions, name, instance_config['url'], timeout),
+            },
+        )
+
+    def _timeout(self, instance_config: dict) -> float:
+        return instance_config.get('timeout') or self.instance_timeout
+
+    def _session(self, sessions: object | None, name: str, url: str, timeout: float) -> object | None:
+        if sessions is None:
+            return None
+        return sessions.get(name, url, timeout)
+
+    def _create_instances(self, loaders: dict[str, InstanceLoader], metadata_cache: MetadataCache | None) -> dict[str, object]:
+        """
+        Build all instances concurrently, going through the metadata cache when
+        one is given: a fresh cache entry is used as is, a stale one is passed
+        to classes that support incremental sync, and any entry is the fallback
+        when the instance fails or runs out of time.
+
+        Each instance gets instance_retries retries and its own deadline of its
+        timeout (instance_timeout unless the instance sets one) per attempt. An
+        instance that fails or runs out of time without a cache entry is left
+        out of the result and recorded in failed_instances.
+        """
+        instances = {}
+        entries = {}
+        for name, loader in loaders.items():
+            entry = metadata_cache.get(name, loader.source) if metadata_cache is not None else None
+            if entry and metadata_cache.is_fresh(entry, loader.instance_config.get('cache_ttl')):
+                instances[name] = loader.instance_class.from_cache(entry['data'])
+            else:
+                entries[name] = entry
+        if entries:
+            started = time.monotonic()
+            executor = ThreadPoolExecutor(max_workers=len(entries))
+            futures = {
+                name: executor.submit(self._load_instance, name, loaders[name], entry, metadata_cache)
+                for name, entry in entries.items()
+            }
+            try:
+                for name, future in futures.items():
+                    deadline = started + self._timeout(loaders[name].instance_config) * (self.instance_retries + 1)
+                    try:
+                        instances[name] = future.result(timeout=max(0, deadline - time.monotonic()))
+                    except Exception as e:
+                        error = 'timed out' if isinstance(e, TimeoutError) else str(e)
+                        entry = entries[name]
+                        if entry:
+                            logger.warning('Failed to fetch data from %s, using cached data: %s', name, error)
+                            instances[name] = loaders[name].instance_class.from_cache(entry['data'])
+                        else:
+                            logger.error('Failed to fetch data from %s, skipping it: %s', name, error)
+                            self.failed_instances.add(name)
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+        return {name: instances[name] for name in loaders if name in instances}
+
+    def _load_instance(self, name: str, loader: InstanceLoader, entry: dict | None, metadata_cache: MetadataCache | None) -> object:
+        """
+        Fetch one instance with retries and store what it returned in the
+        metadata cache. Runs in a worker thread; when it finishes after its
+        deadline the cache is still refreshed for the next run.
+        """
+        kwargs = dict(loader.kwargs)
+        if loader.incremental and entry:
+            kwargs['cached'] = entry['data']
+        instance = self._create_with_retries(name, partial(loader.instance_class, **kwargs))
+        if metadata_cache is not None:
+            metadata_cache.put(name, loader.source, instance.to_cache())
+        return instance
 
+    def _create_with_retries(self, name: str, factory: Callable[[], object]) -> object:
+        for attempt in range(self.instance_retries + 1):
+            try:
+                return factory()
+            except Exception as e:
+                if attempt == self.instance_retries:
+                    raise
+                delay = min(2 ** attempt, 10)
+                logger.warning('Error fetching data from %s: %s, retrying in %ss', name, e, delay)
+                time.sleep(delay)
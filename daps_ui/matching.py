@@ -0,0 +1,355 @@
+import difflib
+import logging
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Iterable, Iterator, NamedTuple
+
+from pathvalidate import sanitize_filename
+
+ID_PATTERN = re.compile(r"\s*\{.*\}$")
+ID_TAG_PATTERN = re.compile(r"\{(tvdb|imdb|tmdb)-([^{}]+)\}", re.IGNORECASE)
+SEASON_PATTERN = re.compile(r"(.+?) - Season (\d+)", re.IGNORECASE)
+SPECIALS_PATTERN = re.compile(r"(.+?) - Specials", re.IGNORECASE)
+YEAR_PATTERN = re.compile(r"\s*\((\d{4})\)\s*$")
+TAG_PATTERN = re.compile(r"\s*\{[^{}]*\}")
+APOSTROPHE_PATTERN = re.compile(r"['\u2019`]")
+NON_WORD_PATTERN = re.compile(r"[\W_]+")
+COLLECTION_SUFFIX = " collection"
+PARSE_CACHE_SIZE = 1 << 17
+FUZZY_CUTOFF = 0.9
+FUZZY_CANDIDATES = 3
+
+logger = logging.getLogger(__name__)
+
+
+class PosterName(NamedTuple):
+    title: str
+    season: int | None = None
+    specials: bool = False
+
+
+class TitleKey(NamedTuple):
+    title: str
+    year: int | None = None
+    ids: tuple[tuple[str, str], ...] = ()
+
+
+class MediaMatch(NamedTuple):
+    category: str
+    name: str
+    fuzzy: bool = False
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_poster_name(name: str) -> PosterName:
+    """
+    Parse a poster file name without extension into its title and season.
+
+    "Show - Season 1" and "Show - Specials" are split into the show title and
+    the season number or specials flag; anything else is kept as the title.
+    Results are cached, so every stage can parse the same name for free.
+    """
+    season_match = SEASON_PATTERN.match(name)
+    if season_match:
+        return PosterName(season_match.group(1), season=int(season_match.group(2)))
+    specials_match = SPECIALS_PATTERN.match(name)
+    if specials_match:
+        return PosterName(specials_match.group(1), specials=True)
+    return PosterName(name)
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def strip_id(name: str) -> str:
+    """
+    Strip tvdb/imdb/tmdb ID from movie title.
+    """
+    return ID_PATTERN.sub("", name)
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def sanitize_name(name: str) -> str:
+    """
+    Asset folder name for a title; cached, as every title is sanitized on
+    every run.
+    """
+    return sanitize_filename(name)
+
+
+def normalize_title(title: str) -> str:
+    """
+    Comparison form of a title: NFKD-normalized without accents, casefolded,
+    apostrophes dropped and any other punctuation collapsed into single
+    spaces, so "Amélie: Part II" and "amelie - part ii" compare equal.
+    """
+    title = "".join(
+        char
+        for char in unicodedata.normalize("NFKD", title)
+        if not unicodedata.combining(char)
+    ).casefold()
+    title = APOSTROPHE_PATTERN.sub("", title)
+    return NON_WORD_PATTERN.sub(" ", title).strip()
+
+
+def parse_title_key(name: str, collection: bool = False) -> TitleKey:
+    """
+    Split a media folder or poster name into its normalized title, year and
+    tvdb/imdb/tmdb IDs, e.g. "Up (2009) {tmdb-14160}" into
+    ("up", 2009, (("tmdb", "14160"),)). For a collection, a trailing
+    "Collection" is dropped as well, so "Alien" and "Alien Collection" share
+    a key.
+    """
+    ids = tuple(
+        (kind.lower(), value.strip().lower())
+        for kind, value in ID_TAG_PATTERN.findall(name)
+    )
+    title = TAG_PATTERN.sub("", name)
+    year = None
+    year_match = YEAR_PATTERN.search(title)
+    if year_match:
+        year = int(year_match.group(1))
+        title = title[: year_match.start()]
+    title = normalize_title(title)
+    if collection:
+        title = title.removesuffix(COLLECTION_SUFFIX) or title
+    return TitleKey(title, year, ids)
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def title_key(name: str) -> TitleKey:
+    """
+    parse_title_key of a poster name, cached, as every stage looks the same
+    poster names up. Media names are parsed once, into the MediaCatalog.
+    """
+    return parse_title_key(name)
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def collection_key(name: str) -> TitleKey:
+    """
+    parse_title_key of a poster name, as a collection title.
+    """
+    return parse_title_key(name, collection=True)
+
+
+class _TitleIndex:
+    """
+    Catalog items of one kind keyed by ID, by (title, year) and by title.
+    """
+
+    def __init__(self, items: Iterable[object]):
+        self.by_id: dict[tuple[str, str], tuple[object, ...]] = {}
+        self.by_title_year: dict[tuple[str, int | None], tuple[object, ...]] = {}
+        self.by_title: dict[str, tuple[object, ...]] = {}
+        self._fuzzy_buckets: dict[object, list[str]] | None = None
+        for item in items:
+            for media_id in item.ids:
+                _add(self.by_id, media_id, item)
+            _add(self.by_title_year, (item.title, item.year), item)
+            _add(self.by_title, item.title, item)
+
+    def lookup(self, key: TitleKey) -> list[str]:
+        """
+        Names of the items matching key: by ID when one of its IDs is known,
+        otherwise by title and year. A key without a year matches a title
+        without a year first and any year of that title after that.
+        """
+        for media_id in key.ids:
+            items = self.by_id.get(media_id)
+            if items:
+                return _distinct(items)
+        items = self.by_title_year.get((key.title, key.year))
+        if not items and key.year is None:
+            items = self.by_title.get(key.title)
+        if not items:
+            return []
+        if key.ids:
+            # A poster carrying an ID never matches media with a different ID.
+            items = [
+                item
+                for item in items
+                if not any(
+                    dict(item.ids).get(kind, value) != value for kind, value in key.ids
+                )
+            ]
+        return _distinct(items)
+
+    def fuzzy_candidates(self, key: TitleKey) -> list[str]:
+        """
+        The titles a fuzzy lookup of key has to rank: those of the same year
+        when key has one (lookup only matches that year anyway), otherwise
+        those sharing its first word. Buckets are built on first use.
+        """
+        if self._fuzzy_buckets is None:
+            self._fuzzy_buckets = {}
+            for title, year in self.by_title_year:
+                if year is not None:
+                    self._fuzzy_buckets.setdefault(year, []).append(title)
+            for title in self.by_title:
+                self._fuzzy_buckets.setdefault(_first_word(title), []).append(title)
+        if key.year is not None:
+            return self._fuzzy_buckets.get(key.year, [])
+        return self._fuzzy_buckets.get(_first_word(key.title), [])
+
+
+def _distinct(items: tuple[object, ...] | list[object]) -> list[str]:
+    """
+    Names of items, folding the ones that are the same media listed
+    differently, e.g. "Up (2009)" in one instance and "Up (2009) {tmdb-14160}"
+    in another: same title and year, and no ID of one kind with different
+    values. The first item of each group stands for it.
+    """
+    if len(items) < 2:
+        return [item.name for item in items]
+    groups = []
+    for item in items:
+        for group in groups:
+            group_item, group_ids = group
+            if (
+                group_item.title == item.title
+                and group_item.year == item.year
+                and all(group_ids.get(kind, value) == value for kind, value in item.ids)
+            ):
+                group_ids.update(item.ids)
+                break
+        else:
+            groups.append((item, dict(item.ids)))
+    return [item.name for item, _ in groups]
+
+
+def _first_word(title: str) -> str:
+    return title.split(" ", 1)[0]
+
+
+def _add(index: dict, key: object, item: object) -> None:
+    # Nearly every key belongs to a single item, and a tuple of one is half
+    # the size of a list.
+    index[key] = index.get(key, ()) + (item,)
+
+
+class MatchIndex:
+    """
+    Lookup tables for matching poster file names against media, built once per run.
+
+    Media folder names (parsed once, into the MediaCatalog) and poster names
+    are reduced to a normalized key (see parse_title_key), so a match is a
+    few hash lookups: by tvdb/imdb/tmdb ID when
+    the poster carries one, then by title and year. Collections are tried
+    first, then movies, then shows. Names of the same title and year without
+    conflicting IDs are one media listed by several instances. A name whose
+    key fits several different media is ambiguous: it is reported and left
+    unmatched instead of going to whichever title happened to come first.
+
+    With a fuzzy_cutoff, names without an exact match fall back to the
+    closest normalized titles (difflib ratio of at least fuzzy_cutoff, same
+    year), again only when the best candidate is unique. Only titles of the
+    same year, or sharing the first word when the name has no year, are
+    ranked.
+    """
+
+    def __init__(self, catalog: object, fuzzy_cutoff: float | None = None):
+        self.indexes = {
+            kind: _TitleIndex(items.values()) for kind, items in catalog.items.items()
+        }
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.ambiguous: dict[str, list[str]] = {}
+        self.fuzzy_matches: dict[str, MediaMatch] = {}
+        self._resolved: dict[str, MediaMatch | None] = {}
+
+    def match(self, name: str) -> str | None:
+        """
+        Return the matched_files category for a file name without extension.
+
+        Args:
+            name (str): File name without extension.
+
+        Returns:
+            str | None: "collections", "movies", "shows" or None if nothing matched.
+        """
+        media_match = self.resolve(name)
+        return media_match.category if media_match else None
+
+    def resolve(self, name: str) -> MediaMatch | None:
+        """
+        Return the media a file name without extension belongs to, or None
+        when nothing, or more than one title, matched. Results are cached, so
+        the copy stage can resolve the names the match stage already did.
+        """
+        if name in self._resolved:
+            return self._resolved[name]
+        media_match = self._resolve_exact(name)
+        if (
+            media_match is None
+            and self.fuzzy_cutoff is not None
+            and name not in self.ambiguous
+        ):
+            media_match = self._resolve_fuzzy(name)
+        self._resolved[name] = media_match
+        return media_match
+
+    def _keys(self, name: str) -> Iterator[tuple[str, TitleKey]]:
+        """
+        The (category, key) pairs to look a name up under, in matching order.
+        Season and specials posters are looked up by their show title.
+        """
+        yield "collections", collection_key(name)
+        key = title_key(name)
+        yield "movies", key
+        poster_name = parse_poster_name(name)
+        if poster_name.season is not None or poster_name.specials:
+            key = title_key(poster_name.title)._replace(ids=key.ids)
+        yield "shows", key
+
+    def _resolve_exact(self, name: str) -> MediaMatch | None:
+        for category, key in self._keys(name):
+            names = self.indexes[category].lookup(key)
+            if len(names) == 1:
+                return MediaMatch(category, names[0])
+            if names:
+                self._report_ambiguous(name, names)
+                return None
+        return None
+
+    def _resolve_fuzzy(self, name: str) -> MediaMatch | None:
+        ranked = []
+        for category, key in self._keys(name):
+            if not key.title:
+                continue
+            index = self.indexes[category]
+            for title in difflib.get_close_matches(
+                key.title,
+                index.fuzzy_candidates(key),
+                FUZZY_CANDIDATES,
+                self.fuzzy_cutoff,
+            ):
+                names = index.lookup(key._replace(title=title, ids=()))
+                if names:
+                    ratio = difflib.SequenceMatcher(None, key.title, title).ratio()
+                    ranked.append((ratio, category, names))
+        if not ranked:
+            return None
+
+        best_ratio = max(ratio for ratio, _, _ in ranked)
+        best = list(
+            dict.fromkeys(
+                (category, media_name)
+                for ratio, category, names in ranked
+                if ratio == best_ratio
+                for media_name in names
+            )
+        )
+        if len(best) > 1:
+            self._report_ambiguous(name, [media_name for _, media_name in best])
+            return None
+        media_match = MediaMatch(*best[0], fuzzy=True)
+        self.fuzzy_matches[name] = media_match
+        logger.debug(
+            "Fuzzy matched %s to %s (%.2f)", name, media_match.name, best_ratio
+        )
+        return media_match
+
+    def _report_ambiguous(self, name: str, names: list[str]) -> None:
+        self.ambiguous[name] = list(names)
+        logger.warning(
+            "Ambiguous match for %s, skipping it: %s", name, ", ".join(names)
+        )
@@ -0,0 +1,55 @@
+import json
+import logging
+import time
+from pathlib import Path
+
+from pathvalidate import sanitize_filename
+
+from daps_ui.cache import write_json_atomic
+
+METADATA_CACHE_TTL = 0
+
+logger = logging.getLogger(__name__)
+
+
+class MetadataCache:
+    """
+    On-disk cache of what each Radarr, Sonarr and Plex instance returned, one
+    JSON file per instance.
+
+    An entry is reused without contacting the instance while it is younger
+    than its TTL, and is used as a fallback when the instance is unreachable.
+    Entries are tied to the instance's source (URL, libraries), so changing the
+    config invalidates them.
+    """
+
+    def __init__(self, cache_dir: str | Path, ttl: float = METADATA_CACHE_TTL):
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+
+    def _path(self, name: str) -> Path:
+        return self.cache_dir / f"{sanitize_filename(name)}.json"
+
+    def get(self, name: str, source: object) -> dict | None:
+        try:
+            with open(self._path(name), "r") as file:
+                entry = json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("Ignoring unreadable metadata cache for %s: %s", name, e)
+            return None
+        if entry.get("source") != source:
+            return None
+        return entry
+
+    def is_fresh(self, entry: dict, ttl: float | None = None) -> bool:
+        ttl = self.ttl if ttl is None else ttl
+        return time.time() - entry["fetched_at"] < ttl
+
+    def put(self, name: str, source: object, data: dict) -> None:
+        entry = {"source": source, "fetched_at": time.time(), "data": data}
+        try:
+            write_json_atomic(self._path(name), entry)
+        except OSError as e:
+            logger.error("Failed to save metadata cache for %s: %s", name, e)
@@ -0,0 +1,118 @@
+import contextlib
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from daps_ui.cache import write_json_atomic
+
+METRICS_PREFIX = "daps_ui_poster_renamerr"
+
+COUNTERS = (
+    "files_scanned",
+    "files_matched",
+    "fuzzy_matches",
+    "ambiguous_matches",
+    "cache_hits",
+    "hashes_computed",
+    "bytes_hashed",
+    "files_copied",
+    "files_replaced",
+    "bytes_copied",
+    "files_optimized",
+    "bytes_saved",
+    "files_deduplicated",
+    "bytes_deduplicated",
+    "files_removed",
+    "conflicts",
+    "errors",
+)
+
+
+class RunMetrics:
+    """
+    Counters and per-stage wall time for one run, safe to update from the
+    copy workers. Exported at the end of a run as a JSON summary and as a
+    Prometheus textfile (for node_exporter's textfile collector).
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.stages: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "started": self.started,
+                "duration_seconds": round(time.time() - self.started, 6),
+                "stages": {
+                    name: round(seconds, 6) for name, seconds in self.stages.items()
+                },
+                "counters": dict(self.counters),
+            }
+
+    def summary(self) -> str:
+        counters = self.to_dict()["counters"]
+        return ", ".join(
+            f"{name.replace('_', ' ')}: {value}" for name, value in counters.items()
+        )
+
+    def write_json(self, path: str | Path) -> None:
+        write_json_atomic(Path(path), self.to_dict(), indent=4)
+
+    def write_prometheus(self, path: str | Path) -> None:
+        """
+        Write the metrics in the Prometheus text format, replacing the file
+        atomically so the textfile collector never reads half of it.
+        """
+        data = self.to_dict()
+        lines = [
+            f"# HELP {METRICS_PREFIX}_stage_seconds Wall time of each stage of the last run.",
+            f"# TYPE {METRICS_PREFIX}_stage_seconds gauge",
+        ]
+        lines += [
+            f'{METRICS_PREFIX}_stage_seconds{{stage="{name}"}} {seconds}'
+            for name, seconds in data["stages"].items()
+        ]
+        for name, value in data["counters"].items():
+            lines += [
+                f"# TYPE {METRICS_PREFIX}_{name} gauge",
+                f"{METRICS_PREFIX}_{name} {value}",
+            ]
+        lines += [
+            f"# TYPE {METRICS_PREFIX}_duration_seconds gauge",
+            f"{METRICS_PREFIX}_duration_seconds {data['duration_seconds']}",
+            f"# TYPE {METRICS_PREFIX}_last_run_timestamp_seconds gauge",
+            f"{METRICS_PREFIX}_last_run_timestamp_seconds {data['started']}",
+        ]
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(
+            dir=path.parent, prefix=f".{path.name}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w") as file:
+                file.write("\n".join(lines) + "\n")
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
@@ -0,0 +1,327 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from daps_ui.cache import write_json_atomic
+from daps_ui.placement import COPY_BUFFER_SIZE, hash_file_into
+
+OPTIMIZE_FORMATS = {"jpeg": ".jpg", "webp": ".webp"}
+OPTIMIZE_FORMAT = "jpeg"
+OPTIMIZE_QUALITY = 90
+OPTIMIZE_MAX_WIDTH = 2000
+OPTIMIZE_MAX_HEIGHT = 3000
+OPTIMIZE_CACHE_DIR = "optimized_posters"
+INDEX_FILE = "index.json"
+
+logger = logging.getLogger(__name__)
+
+
+class OptimizeSettings(NamedTuple):
+    format: str = OPTIMIZE_FORMAT
+    quality: int = OPTIMIZE_QUALITY
+    max_width: int = OPTIMIZE_MAX_WIDTH
+    max_height: int = OPTIMIZE_MAX_HEIGHT
+
+    @property
+    def suffix(self) -> str:
+        return OPTIMIZE_FORMATS[self.format]
+
+    @property
+    def key(self) -> str:
+        return f"{self.format}-q{self.quality}-{self.max_width}x{self.max_height}"
+
+
+class OptimizeResult(NamedTuple):
+    source_hash: str
+    output: str
+    source_size: int
+    output_size: int
+    encoded: bool
+
+
+def output_path(store_dir: Path, source_hash: str, settings: OptimizeSettings) -> Path:
+    """
+    Where the output for a source hash and settings is stored, fanned out
+    over subdirectories by hash prefix.
+    """
+    return (
+        store_dir / source_hash[:2] / f"{source_hash}-{settings.key}{settings.suffix}"
+    )
+
+
+def optimize_poster(
+    source: str, store_dir: str, settings: OptimizeSettings, hash_algorithm: str
+) -> OptimizeResult:
+    """
+    Hash a poster and, unless the store already holds an output for that hash
+    and these settings, resize and re-encode it into the store. Runs in a
+    worker process.
+
+    When re-encoding a poster that already has the target format makes it
+    bigger, the original bytes are stored instead.
+    """
+    hasher = hashlib.new(hash_algorithm)
+    hash_file_into(Path(source), hasher, COPY_BUFFER_SIZE)
+    source_hash = hasher.hexdigest()
+    output = output_path(Path(store_dir), source_hash, settings)
+    source_size = os.stat(source).st_size
+    if output.exists():
+        return OptimizeResult(
+            source_hash, str(output), source_size, output.stat().st_size, False
+        )
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=output.parent, prefix=f".{output.name}.", suffix=".tmp"
+    )
+    os.close(fd)
+    try:
+        with Image.open(source) as image:
+            same_format = image.format == settings.format.upper()
+            image.thumbnail(
+                (settings.max_width, settings.max_height), Image.Resampling.LANCZOS
+            )
+            if settings.format == "jpeg" and image.mode != "RGB":
+                image = image.convert("RGB")
+            elif image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+            image.save(
+                tmp_path,
+                settings.format.upper(),
+                quality=settings.quality,
+                optimize=True,
+            )
+        if same_format and os.stat(tmp_path).st_size >= source_size:
+            shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, output)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+    return OptimizeResult(
+        source_hash, str(output), source_size, output.stat().st_size, True
+    )
+
+
+class PosterOptimizer:
+    """
+    Resizes posters to at most max_width x max_height and re-encodes them as
+    JPEG or WebP across a process pool, before they are copied to the target
+    directory.
+
+    Outputs are stored by source hash and settings, so a poster is encoded
+    once per content and settings, however many sources or runs share it.
+    An index of source path -> (fingerprint, hash) lets unchanged sources skip
+    even the hashing on later runs.
+    """
+
+    def __init__(
+        self,
+        settings: OptimizeSettings | None = None,
+        cache_dir: str | Path | None = None,
+        workers: int | None = None,
+        hash_algorithm: str = "sha256",
+    ):
+        if Image is None:
+            raise RuntimeError("Poster optimization needs Pillow (pip install Pillow)")
+        self.settings = settings or OptimizeSettings()
+        if self.settings.format not in OPTIMIZE_FORMATS:
+            raise ValueError(
+                f"Unknown poster format: {self.settings.format} (expected one of {', '.join(OPTIMIZE_FORMATS)})"
+            )
+        self.cache_dir = Path(cache_dir or OPTIMIZE_CACHE_DIR)
+        self.workers = workers or os.cpu_count() or 1
+        self.hash_algorithm = hash_algorithm
+        self.index = self._load_index()
+        self._executor = None
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    @property
+    def suffix(self) -> str:
+        return self.settings.suffix
+
+    def optimize(
+        self, sources: list[Path], encode: bool = True
+    ) -> dict[Path, OptimizeResult | None]:
+        """
+        Return the stored output of every source, encoding the ones without
+        one. With encode=False only outputs already in the store are
+        returned. Sources that fail to encode map to None.
+        """
+        results = {}
+        pending = []
+        for source in dict.fromkeys(sources):
+            result = self._cached(source)
+            if result is not None:
+                results[source] = result
+            elif encode:
+                pending.append(source)
+        if not pending:
+            return results
+
+        executor = self._get_executor()
+        futures = {
+            source: executor.submit(
+                optimize_poster,
+                str(source),
+                str(self.cache_dir),
+                self.settings,
+                self.hash_algorithm,
+            )
+            for source in pending
+        }
+        for source, future in futures.items():
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error("Error optimizing %s: %s", source, e)
+                results[source] = None
+                continue
+            results[source] = result
+            self._remember(source, result)
+            if result.encoded:
+                logger.debug(
+                    "Optimized %s (%s -> %s bytes)",
+                    source,
+                    result.source_size,
+                    result.output_size,
+                )
+        return results
+
+    def outputs_for(self, source_paths: set[str]) -> set[str]:
+        """
+        Stored outputs of the given sources under the current settings.
+        """
+        outputs = set()
+        for source_path in source_paths:
+            entry = self.index.get(source_path)
+            if entry:
+                outputs.add(str(self._output_path(entry["hash"])))
+        return outputs
+
+    def close(self) -> None:
+        """
+        Shut the process pool down and save the index.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+            dirty, self._dirty = self._dirty, False
+            index = {"hash_algorithm": self.hash_algorithm, "sources": dict(self.index)}
+        if executor is not None:
+            executor.shutdown()
+        if dirty:
+            try:
+                write_json_atomic(self.cache_dir / INDEX_FILE, index)
+            except OSError as e:
+                logger.error("Failed to save optimized poster index: %s", e)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Workers are spawned rather than forked, as the pool may be
+                # started from one of several running copy threads.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _cached(self, source: Path) -> OptimizeResult | None:
+        entry = self.index.get(str(source))
+        if entry is None:
+            return None
+        try:
+            source_stat = source.stat()
+            output = self._output_path(entry["hash"])
+            output_size = output.stat().st_size
+        except OSError:
+            return None
+        if entry["fingerprint"] != _fingerprint(source_stat):
+            return None
+        return OptimizeResult(
+            entry["hash"], str(output), source_stat.st_size, output_size, False
+        )
+
+    def _remember(self, source: Path, result: OptimizeResult) -> None:
+        try:
+            fingerprint = _fingerprint(source.stat())
+        except OSError:
+            return
+        with self._lock:
+            self.index[str(source)] = {
+                "hash": result.source_hash,
+                "fingerprint": fingerprint,
+            }
+            self._dirty = True
+
+    def _output_path(self, source_hash: str) -> Path:
+        return output_path(self.cache_dir, source_hash, self.settings)
+
+    def _load_index(self) -> dict:
+        index_path = self.cache_dir / INDEX_FILE
+        try:
+            with open(index_path) as file:
+                index = json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable optimized poster index: %s", e)
+            return {}
+        if index.get("hash_algorithm") != self.hash_algorithm:
+            return {}
+        return index.get("sources", {})
+
+
+def prune_store(
+    cache_dir: str | Path, keep: set[str], dry_run: bool = False
+) -> tuple[int, int]:
+    """
+    Remove the outputs in the store that are not in keep and forget indexed
+    sources that no longer exist. Returns the number of outputs and bytes
+    removed (or that would be, with dry_run).
+    """
+    cache_dir = Path(cache_dir)
+    keep = {os.path.abspath(path) for path in keep}
+    removed = removed_bytes = 0
+    for output in cache_dir.glob("??/*"):
+        if os.path.abspath(output) in keep or output.name.startswith("."):
+            continue
+        try:
+            size = output.stat().st_size
+            if not dry_run:
+                output.unlink()
+        except FileNotFoundError:
+            continue
+        removed += 1
+        removed_bytes += size
+        logger.debug("Removing unused optimized poster: %s", output)
+
+    index_path = cache_dir / INDEX_FILE
+    try:
+        with open(index_path) as file:
+            index = json.load(file)
+    except (OSError, ValueError):
+        return removed, removed_bytes
+    sources = index.get("sources", {})
+    existing = {path: entry for path, entry in sources.items() if os.path.exists(path)}
+    if len(existing) != len(sources) and not dry_run:
+        index["sources"] = existing
+        write_json_atomic(index_path, index)
+    return removed, removed_bytes
+
+
+def _fingerprint(source_stat: os.stat_result) -> list[int]:
+    return [source_stat.st_size, source_stat.st_mtime_ns]
@@ -0,0 +1,215 @@
+import logging
+import queue
+import threading
+import time
+from pathlib import Path
+
+from daps_ui.scanner import iter_directory
+
+PIPELINE_QUEUE_SIZE = 1000
+REPORT_INTERVAL = 10.0
+
+_DONE = object()
+
+logger = logging.getLogger(__name__)
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.started = None
+        self.finished = None
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def rate(self) -> float:
+        return self.count / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self) -> str:
+        return f"{self.name}: {self.count} files in {self.elapsed:.1f}s ({self.rate:.0f}/s)"
+
+
+class StreamingPipeline:
+    """
+    Scan, match and copy as one streaming pipeline instead of three batch
+    passes. Stages are connected by bounded queues, so a slow stage holds back
+    the ones before it and copying starts with the first poster scanned.
+
+    Only the queues are bounded. The posters in flight between stages are
+    capped at the queue size, but the bookkeeping of a run (file names seen,
+    source paths, matched names, claimed targets and the match index's
+    resolved names) still grows with the library, as in batch mode.
+
+    Source directories are scanned one after another in priority order, so the
+    first file name / poster name seen wins exactly as in batch mode. When two
+    posters map to the same target, the first one scanned wins.
+    """
+
+    def __init__(
+        self,
+        renamer: object,
+        catalog: object,
+        asset_folder_names: dict[str, dict[str, str]] | None = None,
+        queue_size: int = PIPELINE_QUEUE_SIZE,
+        report_interval: float = REPORT_INTERVAL,
+    ):
+        self.renamer = renamer
+        self.asset_folder_names = asset_folder_names
+        self.report_interval = report_interval
+        self.renamer.build_match_index(catalog)
+        self._scanned = queue.Queue(maxsize=queue_size)
+        self._jobs = queue.Queue(maxsize=queue_size)
+        self._failed = threading.Event()
+        self.stats = {
+            "scan": StageStats("scan"),
+            "match": StageStats("match"),
+            "copy": StageStats("copy"),
+        }
+        self._copy_lock = threading.Lock()
+        self.source_file_paths: set[str] = set()
+        self.claimed_targets: dict[str, Path] = {}
+
+    def run(self) -> dict[str, StageStats]:
+        copy_workers = max(1, self.renamer.copy_workers)
+        threads = [
+            threading.Thread(target=self._run_stage, args=(self._scan,)),
+            threading.Thread(target=self._run_stage, args=(self._match, copy_workers)),
+        ]
+        threads += [
+            threading.Thread(target=self._run_stage, args=(self._copy,))
+            for _ in range(copy_workers)
+        ]
+        with self.renamer.metrics.stage("stream"):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(self.report_interval)
+                    if thread.is_alive():
+                        self.report()
+            self.renamer.save_cache()
+            if self.renamer.optimizer is not None:
+                self.renamer.optimizer.close()
+        self.report()
+        self.renamer.report_match_results()
+        if self._failed.is_set():
+            raise RuntimeError("Streaming pipeline stopped after a stage failed")
+        return self.stats
+
+    def report(self) -> None:
+        logger.info(" | ".join(str(stats) for stats in self.stats.values()))
+
+    def _run_stage(self, stage, *args) -> None:
+        try:
+            stage(*args)
+        except Exception as e:
+            logger.error("Pipeline stage %s failed: %s", stage.__name__, e)
+            self._failed.set()
+
+    def _put(self, target_queue: queue.Queue, item: object) -> bool:
+        while not self._failed.is_set():
+            try:
+                target_queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, source_queue: queue.Queue) -> object:
+        while not self._failed.is_set():
+            try:
+                return source_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _scan(self) -> None:
+        stats = self.stats["scan"]
+        stats.started = time.monotonic()
+        unique_files = set()
+        self.renamer.failed_sources = set()
+        try:
+            for source_dir in self.renamer.source_directories:
+                for poster, poster_stat in iter_directory(
+                    Path(source_dir),
+                    self.renamer.image_exts,
+                    self.renamer.recursive,
+                    self.renamer.failed_sources,
+                ):
+                    stats.count += 1
+                    self.renamer.metrics.increment("files_scanned")
+                    if poster.name in unique_files:
+                        continue
+                    unique_files.add(poster.name)
+                    self.source_file_paths.add(str(poster))
+                    self.renamer.source_stats[poster] = poster_stat
+                    if not self._put(self._scanned, poster):
+                        return
+        finally:
+            stats.finished = time.monotonic()
+            self._put(self._scanned, _DONE)
+
+    def _match(self, copy_workers: int) -> None:
+        stats = self.stats["match"]
+        stats.started = time.monotonic()
+        matched_names = set()
+        claimed_targets = self.claimed_targets
+        try:
+            while (poster := self._get(self._scanned)) is not _DONE:
+                stats.count += 1
+                copy_job = None
+                name_without_extension = poster.stem
+                if name_without_extension not in matched_names:
+                    category = self.renamer.match_index.match(name_without_extension)
+                    if category:
+                        matched_names.add(name_without_extension)
+                        self.renamer.metrics.increment("files_matched")
+                        copy_job = self.renamer.copy_job(
+                            category,
+                            poster,
+                            self.asset_folder_names,
+                        )
+                if copy_job:
+                    target_path = str(copy_job[1] / copy_job[2])
+                    if target_path in claimed_targets:
+                        logger.debug(
+                            "Skipping %s: %s is already provided by %s",
+                            poster,
+                            target_path,
+                            claimed_targets[target_path],
+                        )
+                        self.renamer.metrics.increment("conflicts")
+                        copy_job = None
+                    else:
+                        claimed_targets[target_path] = poster
+                if copy_job is None:
+                    self.renamer.source_stats.pop(poster, None)
+                elif not self._put(self._jobs, copy_job):
+                    return
+        finally:
+            stats.finished = time.monotonic()
+            for _ in range(copy_workers):
+                self._put(self._jobs, _DONE)
+
+    def _copy(self) -> None:
+        stats = self.stats["copy"]
+        with self._copy_lock:
+            if stats.started is None:
+                stats.started = time.monotonic()
+        while (copy_job := self._get(self._jobs)) is not _DONE:
+            source = copy_job[0]
+            copy_jobs = [copy_job]
+            if self.renamer.optimizer is not None:
+                copy_jobs = self.renamer._optimize_copy_jobs(copy_jobs)
+            for copy_job in copy_jobs:
+                self.renamer._copy_file(*copy_job)
+            self.renamer.source_stats.pop(source, None)
+            with self._copy_lock:
+                stats.count += 1
+                stats.finished = time.monotonic()
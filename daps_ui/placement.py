@@ -0,0 +1,274 @@
+import errno
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+PLACEMENT_MODES = ("auto", "hardlink", "reflink", "kernel", "copy")
+FICLONE = 0x40049409
+COPY_CHUNK_SIZE = 1 << 30
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# Errors meaning "this method does not work between these two filesystems",
+# as opposed to a real I/O failure.
+UNSUPPORTED_ERRORS = {
+    errno.EXDEV,
+    errno.EPERM,
+    errno.EMLINK,
+    errno.EINVAL,
+    errno.ENOSYS,
+    errno.ENOTTY,
+    errno.EOPNOTSUPP,
+    errno.ENOTSUP,
+    errno.EBADF,
+}
+
+# Methods that share blocks with an identical file instead of copying it.
+LINK_METHODS = ("hardlink", "reflink")
+
+# Methods tried for each mode, best first, before falling back to a copy.
+FALLBACKS = {
+    "auto": ("reflink", "kernel"),
+    "hardlink": ("hardlink", "reflink", "kernel"),
+    "reflink": ("reflink", "kernel"),
+    "kernel": ("kernel",),
+    "copy": (),
+}
+
+
+class StagedFile:
+    """
+    A file placed under a temporary name next to its target, waiting to be
+    renamed into place or thrown away.
+    """
+
+    def __init__(self, tmp_path: str | None, target: Path, method: str):
+        self.tmp_path = tmp_path
+        self.target = target
+        self.method = method
+
+    def commit(self) -> None:
+        if self.tmp_path:
+            os.replace(self.tmp_path, self.target)
+            self.tmp_path = None
+
+    def discard(self) -> None:
+        if self.tmp_path:
+            Path(self.tmp_path).unlink(missing_ok=True)
+            self.tmp_path = None
+
+
+class FilePlacer:
+    """
+    Places a source file at a target path using the cheapest method the two
+    filesystems support: a hardlink, a reflink (FICLONE on btrfs/XFS), an
+    in-kernel copy (copy_file_range or sendfile) or a regular copy.
+
+    The file is always placed under a temporary name in the target directory
+    and renamed over the target, so an existing target, which may be a
+    hardlink to a source, is replaced instead of written through. Methods
+    that fail between two devices are not tried again for that pair.
+
+    When a hasher is passed, the source is read only once: copies hash the
+    bytes as they are written, links hash the source after linking it.
+    """
+
+    def __init__(self, mode: str = "auto", buffer_size: int = COPY_BUFFER_SIZE):
+        if mode not in FALLBACKS:
+            raise ValueError(
+                f"Unknown placement mode: {mode} (expected one of {', '.join(PLACEMENT_MODES)})"
+            )
+        self.mode = mode
+        self.buffer_size = buffer_size
+        self._unsupported: set[tuple[str, int, int]] = set()
+        self._lock = threading.Lock()
+
+    def stage(
+        self,
+        source: Path,
+        target: Path,
+        source_stat: os.stat_result | None = None,
+        hasher: object | None = None,
+    ) -> StagedFile:
+        """
+        Place source under a temporary name next to target, updating hasher
+        with its contents. Nothing is staged when target already is the
+        source file.
+        """
+        source_stat = source_stat or os.stat(source)
+        try:
+            if os.path.samestat(source_stat, os.stat(target)):
+                if hasher is not None:
+                    self._hash(source, hasher)
+                return StagedFile(None, target, "same")
+        except FileNotFoundError:
+            pass
+        target_dev = os.stat(target.parent).st_dev
+        devices = (source_stat.st_dev, target_dev)
+
+        for method in FALLBACKS[self.mode]:
+            if (method, *devices) in self._unsupported:
+                continue
+            if hasher is not None and method == "kernel":
+                # The bytes have to pass through user space to be hashed anyway.
+                continue
+            try:
+                tmp_path = self._stage_with(method, source, target)
+            except OSError as e:
+                if e.errno not in UNSUPPORTED_ERRORS:
+                    raise
+                with self._lock:
+                    self._unsupported.add((method, *devices))
+                continue
+            try:
+                if hasher is not None:
+                    self._hash(source, hasher)
+            except BaseException:
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
+            return StagedFile(tmp_path, target, method)
+        if hasher is not None:
+            return StagedFile(self._stream(source, target, hasher), target, "copy")
+        return StagedFile(self._stage_with("copy", source, target), target, "copy")
+
+    def link(
+        self,
+        existing: Path,
+        target: Path,
+        existing_stat: os.stat_result | None = None,
+        methods: tuple[str, ...] = LINK_METHODS,
+    ) -> StagedFile | None:
+        """
+        Stage a hardlink or reflink (of methods, in that order) to a file with
+        the same contents as the source, usually another target, so identical
+        posters share their blocks. Returns None when none works between the
+        two, or when existing no longer is the file existing_stat describes
+        once staged (it was replaced or modified in between).
+        """
+        existing_stat = existing_stat or os.stat(existing)
+        try:
+            if os.path.samestat(existing_stat, os.stat(target)):
+                return StagedFile(None, target, "same")
+        except FileNotFoundError:
+            pass
+        devices = (existing_stat.st_dev, os.stat(target.parent).st_dev)
+        for method in methods:
+            if (method, *devices) in self._unsupported:
+                continue
+            try:
+                tmp_path = self._stage_with(method, existing, target)
+            except OSError as e:
+                if e.errno not in UNSUPPORTED_ERRORS:
+                    raise
+                with self._lock:
+                    self._unsupported.add((method, *devices))
+                continue
+            # A hardlink is the inode it was made from; a reflink is checked
+            # by existing still being the same, unmodified inode after it.
+            staged_stat = os.stat(tmp_path if method == "hardlink" else existing)
+            if _identity(staged_stat) != _identity(existing_stat):
+                Path(tmp_path).unlink(missing_ok=True)
+                return None
+            return StagedFile(tmp_path, target, method)
+        return None
+
+    def _stage_with(self, method: str, source: Path, target: Path) -> str:
+        fd, tmp_path = _mkstemp(target)
+        try:
+            if method == "hardlink":
+                os.close(fd)
+                os.unlink(tmp_path)
+                os.link(source, tmp_path)
+            elif method == "copy":
+                os.close(fd)
+                shutil.copy2(source, tmp_path)
+            else:
+                with os.fdopen(fd, "wb") as dst, open(source, "rb") as src:
+                    if method == "reflink":
+                        _reflink(src.fileno(), dst.fileno())
+                    else:
+                        _copy_file_range(src.fileno(), dst.fileno())
+                shutil.copystat(source, tmp_path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        return tmp_path
+
+    def _stream(self, source: Path, target: Path, hasher: object) -> str:
+        """
+        Copy source to a temporary file next to target, hashing the bytes
+        on the way through.
+        """
+        fd, tmp_path = _mkstemp(target)
+        buffer = bytearray(self.buffer_size)
+        view = memoryview(buffer)
+        try:
+            with os.fdopen(fd, "wb", buffering=0) as dst, open(
+                source, "rb", buffering=0
+            ) as src:
+                while size := src.readinto(buffer):
+                    chunk = view[:size]
+                    hasher.update(chunk)
+                    while chunk:
+                        chunk = chunk[dst.write(chunk) :]
+            shutil.copystat(source, tmp_path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        return tmp_path
+
+    def _hash(self, source: Path, hasher: object) -> None:
+        hash_file_into(source, hasher, self.buffer_size)
+
+
+def hash_file_into(file_path: Path, hasher: object, buffer_size: int) -> None:
+    """
+    Feed the contents of a file to a hashlib hasher, reading into one reused
+    buffer.
+    """
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with open(file_path, "rb", buffering=0) as file:
+        while size := file.readinto(buffer):
+            hasher.update(view[:size])
+
+
+def _mkstemp(target: Path) -> tuple[int, str]:
+    return tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.", suffix=".tmp")
+
+
+def _identity(file_stat: os.stat_result) -> tuple[int, int, int, int]:
+    return (
+        file_stat.st_dev,
+        file_stat.st_ino,
+        file_stat.st_size,
+        file_stat.st_mtime_ns,
+    )
+
+
+def _reflink(src_fd: int, dst_fd: int) -> None:
+    if fcntl is None:
+        raise OSError(errno.ENOSYS, "reflinks are not available on this platform")
+    fcntl.ioctl(dst_fd, FICLONE, src_fd)
+
+
+def _copy_file_range(src_fd: int, dst_fd: int) -> None:
+    """
+    Copy a whole file in the kernel with copy_file_range, or sendfile when
+    copy_file_range is not available.
+    """
+    if hasattr(os, "copy_file_range"):
+        while os.copy_file_range(src_fd, dst_fd, COPY_CHUNK_SIZE):
+            pass
+    elif hasattr(os, "sendfile"):
+        offset = 0
+        while sent := os.sendfile(dst_fd, src_fd, offset, COPY_CHUNK_SIZE):
+            offset += sent
+    else:
+        raise OSError(errno.ENOSYS, "in-kernel copies are not available")
@@ -0,0 +1,80 @@
+from pathlib import Path
+from typing import NamedTuple
+
+PLAN_ACTIONS = ("copy", "replace", "skip", "delete", "forget")
+
+
+class PlannedAction(NamedTuple):
+    action: str
+    target: Path
+    source: Path | None
+    reason: str
+    size: int = 0
+
+
+class SyncPlan:
+    """
+    Everything a run would do to the target directory, decided up front:
+    posters to copy, replace or skip, orphaned posters to delete and cache
+    entries to forget (drop without touching the poster), each with the
+    reason it was chosen.
+
+    A "replace" for a modified source is only a candidate: the executor hashes
+    the source and still skips it when the contents did not change.
+    """
+
+    def __init__(self):
+        self.actions: list[PlannedAction] = []
+
+    def add(
+        self,
+        action: str,
+        target: Path,
+        source: Path | None,
+        reason: str,
+        size: int = 0,
+    ) -> None:
+        self.actions.append(PlannedAction(action, target, source, reason, size))
+
+    def __iter__(self):
+        return iter(self.actions)
+
+    def __len__(self) -> int:
+        return len(self.actions)
+
+    def counts(self) -> dict[str, int]:
+        counts = dict.fromkeys(PLAN_ACTIONS, 0)
+        for action in self.actions:
+            counts[action.action] += 1
+        return counts
+
+    @property
+    def bytes_to_write(self) -> int:
+        return sum(
+            action.size
+            for action in self.actions
+            if action.action in ("copy", "replace")
+        )
+
+    def by_target_dir(self) -> dict[Path, list[PlannedAction]]:
+        """
+        Actions grouped by the directory they write to, in plan order.
+        """
+        groups = {}
+        for action in self.actions:
+            groups.setdefault(action.target.parent, []).append(action)
+        return groups
+
+    def summary(self) -> str:
+        counts = self.counts()
+        return (
+            ", ".join(f"{count} {action}" for action, count in counts.items())
+            + f" ({self.bytes_to_write / 1024 / 1024:.1f} MiB to write)"
+        )
+
+    def describe(self, include_skipped: bool = False) -> None:
+        for action in self.actions:
+            if action.action == "skip" and not include_skipped:
+                continue
+            source = f" <- {action.source}" if action.source else ""
+            print(f"{action.action:<8}{action.target}{source} ({action.reason})")
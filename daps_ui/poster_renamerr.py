@@ -1,151 +1,305 @@
 from pathlib import Path
-from plexapi.server import PlexServer
-from arrapi import SonarrAPI, RadarrAPI
-import re
-from tqdm import tqdm
+import os
+import sys
+import logging
 import shutil
-from pathvalidate import sanitize_filename
-import json
 import hashlib
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from daps_ui.cache import CopyCache, create_cache
+from daps_ui.catalog import MediaCatalog
+from daps_ui.placement import LINK_METHODS, FilePlacer, hash_file_into
+from daps_ui.plan import PlannedAction, SyncPlan
+from daps_ui.metrics import RunMetrics
+from daps_ui.scanner import scan_directories
+from daps_ui.matching import (
+    MatchIndex,
+    MediaMatch,
+    parse_poster_name,
+    sanitize_name,
+)
+
+HASH_BUFFER_SIZE = 1024 * 1024
+HASH_ALGORITHM = "sha256"
+COPY_WORKERS = 4
+APPLY_BATCH_SIZE = 64
+COLLECTION_PAGE_SIZE = 1000
+PLEX_COLLECTION_TYPE = 18
+SYNC_OVERLAP = 300
+FULL_SYNC_INTERVAL = 24 * 3600
+
+logger = logging.getLogger(__name__)
 
 
 class Media:
     @staticmethod
-    def _get_paths(all_objects: list[object]) -> list[Path]:
+    def _get_names(all_objects: list[object]) -> list[str]:
         """
-        Method to get paths from media objects (movies or series).
+        Folder names of media objects (movies or series), interned, as the
+        same names come back from every instance and go into the MediaCatalog.
         """
-        return [Path(item.path) for item in all_objects]
-
-    def get_dicts(
-        self,
-        movies_list: list[Path],
-        series_list: list[Path],
-        movies_collection_list: list[str],
-        series_collection_list: list[str],
-    ) -> tuple[dict[str, list[str]], dict[str, list[str]]]:
-        """
-        Combines all unique movies, series and collections into dictionaries.
-        """
-        media_dict = {"movies": [], "shows": []}
-        collections_dict = {"movies": [], "shows": []}
-        movie_name_list = [item.name for item in movies_list]
-        series_name_list = [item.name for item in series_list]
-        unique_movies = set()
-        unique_shows = set()
-        unique_movie_collections = set()
-        unique_show_collections = set()
-
-        for movie in movie_name_list:
-            self._process_list(movie, unique_movies, media_dict, key="movies")
-        for show in series_name_list:
-            self._process_list(show, unique_shows, media_dict, key="shows")
-        for collection in movies_collection_list:
-            self._process_list(
-                collection, unique_movie_collections, collections_dict, key="movies"
-            )
-        for collection in series_collection_list:
-            self._process_list(
-                collection, unique_show_collections, collections_dict, key="shows"
-            )
-        return media_dict, collections_dict
+        return [sys.intern(Path(item.path).name) for item in all_objects]
 
     @staticmethod
-    def _process_list(item: object, unique_set: set, final_dict: dict, key: str) -> None:
-        if item not in unique_set:
-            unique_set.add(item)
-            final_dict[key].append(item)
+    def _names_from_cache(paths: list[str]) -> list[str]:
+        # Older metadata caches hold full paths instead of folder names.
+        return [sys.intern(Path(path).name) for path in paths]
 
 
 class Radarr(Media):
-    def __init__(self, base_url: str, api: str):
+    def __init__(
+        self,
+        base_url: str,
+        api: str,
+        timeout: float | None = None,
+        session: object | None = None,
+    ):
+        # The client libraries are slow to import, so they are only imported
+        # once an instance is actually contacted.
+        from arrapi import RadarrAPI
+        from daps_ui.utils import TimeoutSession
+
         super().__init__()
-        self.radarr = RadarrAPI(base_url, api)
+        self.radarr = RadarrAPI(
+            base_url, api, session=session or TimeoutSession(timeout)
+        )
         self.get_all_movies()
 
     def get_all_movies(self) -> list[object]:
         all_movie_objects = self.radarr.all_movies()
-        self.movies = self._get_paths(all_movie_objects)
+        self.movies = self._get_names(all_movie_objects)
+
+    def to_cache(self) -> dict:
+        return {"movies": self.movies}
+
+    @classmethod
+    def from_cache(cls, data: dict) -> "Radarr":
+        radarr = cls.__new__(cls)
+        radarr.radarr = None
+        radarr.movies = cls._names_from_cache(data["movies"])
+        return radarr
 
 
 class Sonarr(Media):
-    def __init__(self, base_url: str, api: str):
+    def __init__(
+        self,
+        base_url: str,
+        api: str,
+        timeout: float | None = None,
+        session: object | None = None,
+    ):
+        from arrapi import SonarrAPI
+        from daps_ui.utils import TimeoutSession
+
         super().__init__()
-        self.sonarr = SonarrAPI(base_url, api)
+        self.sonarr = SonarrAPI(
+            base_url, api, session=session or TimeoutSession(timeout)
+        )
         self.get_all_series()
 
     def get_all_series(self) -> list[object]:
         all_series_objects = self.sonarr.all_series()
-        self.series = self._get_paths(all_series_objects)
+        self.series = self._get_names(all_series_objects)
+
+    def to_cache(self) -> dict:
+        return {"series": self.series}
+
+    @classmethod
+    def from_cache(cls, data: dict) -> "Sonarr":
+        sonarr = cls.__new__(cls)
+        sonarr.sonarr = None
+        sonarr.series = cls._names_from_cache(data["series"])
+        return sonarr
 
 
 class Server:
-    def __init__(self, plex_url: str, plex_token: str, library_names: list[str]):
-        self.plex = PlexServer(plex_url, plex_token)
-        self.library_names = library_names
-        self.get_collections()
+    def __init__(
+        self,
+        plex_url: str,
+        plex_token: str,
+        library_names: list[str],
+        timeout: float | None = None,
+        cached: dict | None = None,
+        session: object | None = None,
+    ):
+        from plexapi.server import PlexServer
 
-    def get_collections(self) -> None:
+        self.plex = PlexServer(plex_url, plex_token, session=session, timeout=timeout)
+        self.library_names = library_names
+        self.get_collections(cached)
+
+    def to_cache(self) -> dict:
+        return {"libraries": self.libraries, "failed_libraries": self.failed_libraries}
+
+    @classmethod
+    def from_cache(cls, data: dict) -> "Server":
+        server = cls.__new__(cls)
+        server.plex = None
+        server.library_names = list(data["libraries"])
+        server.libraries = data["libraries"]
+        server.failed_libraries = data.get("failed_libraries", [])
+        server._build_collection_lists()
+        return server
+
+    def get_collections(self, cached: dict | None = None) -> None:
         """
         Retrieve collections from a plex server.
 
+        Libraries are fetched in parallel. When a previous result is passed in,
+        each library only fetches collections updated since its last sync.
+        Libraries that could not be fetched are listed in failed_libraries.
+
         Args:
-            libraries (list[str]): List of libraries in plex server.
+            cached (dict, optional): Result of a previous to_cache() call.
+        """
+        cached_libraries = (cached or {}).get("libraries", {})
+        library_names = self.library_names or []
+
+        with ThreadPoolExecutor(max_workers=max(1, len(library_names))) as executor:
+            results = list(
+                executor.map(
+                    lambda name: self._fetch_library_collections(
+                        name, cached_libraries.get(name)
+                    ),
+                    library_names,
+                )
+            )
 
-        Returns:
-            dict (str, list[str]): Dictionary with movie collection names and show collection names.
+        self.libraries = {
+            name: result
+            for name, result in zip(library_names, results)
+            if result is not None
+        }
+        self.failed_libraries = [
+            name for name, result in zip(library_names, results) if result is None
+        ]
+        self._build_collection_lists()
+
+    def _build_collection_lists(self) -> None:
+        """
+        Merge library collections in library_names order, so the first library
+        to contain a collection title keeps it.
         """
         movie_collections_list = []
         show_collections_list = []
         unique_collections = set()
 
-        for library_name in self.library_names:
-            try:
-                library = self.plex.library.section(library_name)
-            except Exception as e:
-                print(f"Library '{library_name}' not found: {e}")
-                continue
-
-            if library.type == "movie":
-                self._movie_collection(
-                    library, library_name, unique_collections, movie_collections_list
-                )
-            if library.type == "show":
-                self._show_collection(
-                    library, library_name, unique_collections, show_collections_list
+        for library in self.libraries.values():
+            titles = library["collections"].values()
+            if library["type"] == "movie":
+                self._add_collections(
+                    titles, unique_collections, movie_collections_list
                 )
+            if library["type"] == "show":
+                self._add_collections(titles, unique_collections, show_collections_list)
         self.movie_collections = movie_collections_list
         self.series_collections = show_collections_list
 
-    def _movie_collection(
-        self,
-        library: object,
-        library_name: str,
-        unique_collections: set,
-        movie_collections_list: list[str],
-    ) -> None:
-        collections = library.collections()
-        for collection in tqdm(
-            collections, desc=f"Processing collections from {library_name}"
+    def _fetch_library_collections(
+        self, library_name: str, cached_library: dict | None = None
+    ) -> dict | None:
+        try:
+            library = self.plex.library.section(library_name)
+        except Exception as e:
+            logger.warning("Library '%s' not found: %s", library_name, e)
+            return None
+
+        synced_at = full_synced_at = int(time.time())
+        collections = None
+        if (
+            cached_library
+            and cached_library.get("type") == library.type
+            and synced_at - cached_library.get("full_synced_at", 0) < FULL_SYNC_INTERVAL
         ):
-            if collection.title not in unique_collections:
-                unique_collections.add(collection.title)
-                movie_collections_list.append(collection.title)
+            collections = self._sync_library_collections(library, cached_library)
+            full_synced_at = cached_library["full_synced_at"]
+        if collections is None:
+            full_synced_at = synced_at
+            collections = dict(self._iter_collections(library))
+            logger.info(
+                "Fetched %s collections from %s", len(collections), library_name
+            )
+        return {
+            "type": library.type,
+            "collections": collections,
+            "synced_at": synced_at,
+            "full_synced_at": full_synced_at,
+        }
+
+    def _sync_library_collections(
+        self, library: object, cached_library: dict
+    ) -> dict[str, str] | None:
+        """
+        Apply collections added or changed since the last sync to the cached
+        ones. Returns None when the merged count no longer matches the server
+        (a collection was deleted), so the caller falls back to a full fetch.
+
+        A deletion offset by an addition keeps the count, so the caller also
+        fetches in full once every FULL_SYNC_INTERVAL.
+        """
+        collections = dict(cached_library["collections"])
+        changed_since = {"updatedAt>>": cached_library["synced_at"] - SYNC_OVERLAP}
+        collections.update(self._iter_collections(library, changed_since))
+        if len(collections) != self._count_collections(library):
+            return None
+        return collections
 
-    def _show_collection(
+    def _collection_query(
         self,
         library: object,
-        library_name: str,
-        unique_collections: set,
-        show_collections_list: list[str],
+        container_start: int,
+        container_size: int,
+        filters: dict | None = None,
+    ) -> object:
+        headers = {
+            "X-Plex-Container-Start": str(container_start),
+            "X-Plex-Container-Size": str(container_size),
+        }
+        params = {"type": PLEX_COLLECTION_TYPE, **(filters or {})}
+        return self.plex.query(
+            f"/library/sections/{library.key}/all", headers=headers, params=params
+        )
+
+    def _count_collections(self, library: object) -> int:
+        data = self._collection_query(library, 0, 0)
+        if data is None:
+            return 0
+        return int(data.attrib.get("totalSize", data.attrib.get("size", 0)))
+
+    def _iter_collections(self, library: object, filters: dict | None = None):
+        """
+        Yield (ratingKey, title) for the collections of a library section page
+        by page, reading the raw XML instead of building plexapi objects.
+        """
+        container_start = 0
+        while True:
+            data = self._collection_query(
+                library, container_start, COLLECTION_PAGE_SIZE, filters
+            )
+            if data is None:
+                return
+            page_size = 0
+            for element in data:
+                page_size += 1
+                title = element.attrib.get("title")
+                if title is not None:
+                    yield element.attrib.get("ratingKey", title), title
+            container_start += page_size
+            total_size = data.attrib.get("totalSize")
+            if page_size < COLLECTION_PAGE_SIZE or (
+                total_size is not None and container_start >= int(total_size)
+            ):
+                return
+
+    @staticmethod
+    def _add_collections(
+        titles: list[str], unique_collections: set, collections_list: list[str]
     ) -> None:
-        collections = library.collections()
-        for collection in tqdm(
-            collections, desc=f"Processing collections from {library_name}"
-        ):
-            if collection.title not in unique_collections:
-                unique_collections.add(collection.title)
-                show_collections_list.append(collection.title)
+        for title in titles:
+            if title not in unique_collections:
+                unique_collections.add(title)
+                collections_list.append(title)
 
 
 class PosterRenamerr(Server):
@@ -155,34 +309,75 @@ class PosterRenamerr(Server):
         source_directories: list,
         asset_folders: bool,
         cache_file: str,
+        verify_hashes: bool = False,
+        hash_buffer_size: int | None = None,
+        cache_backend: str = "sqlite",
+        copy_workers: int | None = None,
+        recursive: bool = False,
+        placement: str = "auto",
+        hash_algorithm: str | None = None,
+        remove_orphans: bool = False,
+        fuzzy_cutoff: float | None = None,
+        optimizer: object | None = None,
+        dedupe: bool = False,
+        read_only: bool = False,
     ):
         self.target_path = Path(target_path)
         self.source_directories = source_directories
         self.asset_folders = asset_folders
         self.cache_file = Path(cache_file)
+        self.verify_hashes = verify_hashes
+        self.hash_buffer_size = hash_buffer_size or HASH_BUFFER_SIZE
+        self.cache_backend = cache_backend
+        self.copy_workers = copy_workers or COPY_WORKERS
+        self.recursive = recursive
+        self.hash_algorithm = hash_algorithm or HASH_ALGORITHM
+        hashlib.new(self.hash_algorithm)
+        self.placer = FilePlacer(placement, self.hash_buffer_size)
+        self.remove_orphans = remove_orphans
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.optimizer = optimizer
+        self.dedupe = dedupe
+        self.read_only = read_only
+        self.match_index: MatchIndex | None = None
         self.cache = self.load_cache()
+        self.source_stats: dict[Path, os.stat_result] = {}
+        self.failed_sources: set[str] = set()
+        self.metrics = RunMetrics()
 
     image_exts = {".png", ".jpg", ".jpeg"}
 
-    def load_cache(self) -> dict:
-        if self.cache_file.exists():
-            with open(self.cache_file, "r") as file:
-                return json.load(file)
-        return {"copied_files": {}}
+    def load_cache(self) -> CopyCache:
+        return create_cache(
+            self.cache_file, self.cache_backend, read_only=self.read_only
+        )
 
     def save_cache(self) -> None:
         try:
-            with open(self.cache_file, "w") as file:
-                json.dump(self.cache, file, indent=4)
+            self.cache.commit()
         except Exception as e:
-            print(f"Failed to save cache: {e}")
+            logger.error("Failed to save cache: %s", e)
 
     def hash_file(self, file_path: Path) -> str:
-        sha256_hash = hashlib.sha256()
-        with file_path.open("rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-        return sha256_hash.hexdigest()
+        hasher = hashlib.new(self.hash_algorithm)
+        hash_file_into(file_path, hasher, self.hash_buffer_size)
+        return hasher.hexdigest()
+
+    def _source_stat(self, file_path: Path) -> os.stat_result:
+        return self.source_stats.get(file_path) or file_path.stat()
+
+    def _fingerprint(self, file_path: Path) -> list[int]:
+        """
+        Size, mtime, inode and device of a source file, taken from the scan when
+        available. A matching fingerprint means the cached hash is still valid.
+        """
+        file_stat = self._source_stat(file_path)
+        return [
+            file_stat.st_size,
+            file_stat.st_mtime_ns,
+            file_stat.st_ino,
+            file_stat.st_dev,
+        ]
 
     def remove_deleted_files_from_cache(
         self, source_files: dict[str, list[Path]]
@@ -190,365 +385,885 @@ class PosterRenamerr(Server):
         source_file_paths = {
             str(file) for file_list in source_files.values() for file in file_list
         }
-        updated_cache = {
-            path: data
-            for path, data in self.cache["copied_files"].items()
-            if data["source_path"] in source_file_paths
-        }
+        self.prune_cache_sources(source_file_paths)
 
-        if len(updated_cache) != len(self.cache["copied_files"]):
-            self.cache["copied_files"] = updated_cache
-            self.save_cache()
-            print("Removed deleted files from cache")
+    def prune_cache_sources(
+        self,
+        source_file_paths: set[str],
+        claimed_targets: dict | None = None,
+    ) -> None:
+        """
+        Drop the cache entries whose source is not one of source_file_paths,
+        removing their posters too when remove_orphans is set (see
+        _plan_orphans for claimed_targets).
+        """
+        plan = SyncPlan()
+        self._plan_orphans(plan, source_file_paths, claimed_targets)
+        if plan:
+            self.apply_plan(plan)
+
+    def remove_sources_from_cache(self, source_paths: set[str]) -> None:
+        """
+        Drop the cache entries copied from any of the given source paths,
+        removing their posters too when remove_orphans is set.
+        """
+        plan = SyncPlan()
+        action = "delete" if self.remove_orphans else "forget"
+        if self.optimizer is not None:
+            source_paths = source_paths | self.optimizer.outputs_for(source_paths)
+        for source_path in sorted(source_paths):
+            for target_path in sorted(self.cache.targets_for(source_path)):
+                plan.add(action, Path(target_path), Path(source_path), "source deleted")
+        if plan:
+            self.apply_plan(plan)
 
     def get_source_files(self) -> dict[str, list[Path]]:
+        """
+        Collect source posters from all source directories, scanned concurrently.
+
+        Directories are listed in priority order: when the same file name exists
+        in several of them, only the first one is kept. The stat result of every
+        poster is stored in source_stats for the later stages, and directories
+        that could not be scanned in failed_sources.
+        """
+        with self.metrics.stage("scan"):
+            return self._get_source_files()
+
+    def _get_source_files(self) -> dict[str, list[Path]]:
         source_directories = [Path(item) for item in self.source_directories]
         source_files = {}
         unique_files = set()
-        for source_dir in source_directories:
-            for poster in tqdm(
-                source_dir.glob("*"), desc=f"Processing source files in {source_dir}"
-            ):
-                if not poster.is_file():
-                    continue
-                if poster.suffix.lower() in self.image_exts:
-                    if source_dir not in source_files:
-                        source_files[source_dir] = []
-                    if poster not in unique_files:
-                        unique_files.add(poster.name)
-                        source_files[source_dir].append(poster)
+        self.failed_sources = set()
+        scanned = scan_directories(
+            source_directories, self.image_exts, self.recursive, self.failed_sources
+        )
+        for source_dir, posters in zip(source_directories, scanned):
+            logger.info("Found %s source files in %s", len(posters), source_dir)
+            self.metrics.increment("files_scanned", len(posters))
+            for poster, poster_stat in posters:
+                self.source_stats[poster] = poster_stat
+                if source_dir not in source_files:
+                    source_files[source_dir] = []
+                if poster.name not in unique_files:
+                    unique_files.add(poster.name)
+                    source_files[source_dir].append(poster)
         return source_files
 
+    def _is_source_file(self, file_path: Path) -> bool:
+        """
+        Check a source file against the stat data captured by get_source_files,
+        only touching the filesystem for files that were not part of the scan.
+        """
+        if file_path in self.source_stats:
+            return True
+        return file_path.is_file()
+
     def match_files_with_media(
         self,
         source_files: dict[str, list[Path]],
-        media_dict: dict[str, list[str]],
-        collections_dict: dict[str, list[str]],
+        catalog: MediaCatalog,
     ) -> dict[str, list[Path]]:
 
-        matched_files = {
-            "collections": [],
-            "movies": [],
-            "shows": [],
-        }
-        
-        flattened_col_list = [
-            item for sublist in collections_dict.values() for item in sublist
-        ]
-        append_str = " Collection"
-        modified_col_list = [item + append_str for item in flattened_col_list]
-
-        for directory, files in source_files.items():
-            for file in tqdm(files, desc=f"Matching files in {directory}"):
-                name_without_extension = file.stem
-                matched = False
-
-                for matched_list in matched_files.values():
-                    if any(
-                        name_without_extension == matched_file.stem
-                        for matched_file in matched_list
-                    ):
-                        matched = True
-                        break
-
-                if not matched:
-                    for collection_name in modified_col_list:
-                        if name_without_extension in collection_name:
-                            matched_files["collections"].append(file)
-                            matched = True
-                            break
-
-                if not matched:
-                    for movie_names in media_dict["movies"]:
-                        if name_without_extension in movie_names:
-                            matched_files["movies"].append(file)
-                            matched = True
-                            break
-
-                if not matched:
-                    for show_name in media_dict["shows"]:
-
-                        stripped_name = self._strip_id(show_name)
-                        if (
-                            name_without_extension == stripped_name
-                            or self._match_show_season(
-                                name_without_extension, stripped_name
-                            )
-                            or self._match_show_special(
-                                name_without_extension, stripped_name
-                            )
-                        ):
-                            matched_files["shows"].append(file)
-                            matched = True
-                            break
-        return matched_files
-    
-    @staticmethod
-    def _match_show_season(file_name: str, show_name: str) -> bool:
-        season_pattern = re.compile(
-            rf"{re.escape(show_name)} - Season \d+", re.IGNORECASE
-        )
-        if season_pattern.match(file_name):
-            return True
+        with self.metrics.stage("match"):
+            matched_files = {
+                "collections": [],
+                "movies": [],
+                "shows": [],
+            }
+            self.build_match_index(catalog)
+            matched_names = set()
+
+            for directory, files in source_files.items():
+                logger.debug("Matching %s files in %s", len(files), directory)
+                for file in files:
+                    name_without_extension = file.stem
+                    if name_without_extension in matched_names:
+                        continue
+
+                    category = self.match_index.match(name_without_extension)
+                    if category:
+                        matched_files[category].append(file)
+                        matched_names.add(name_without_extension)
+            matched = sum(map(len, matched_files.values()))
+            self.metrics.increment("files_matched", matched)
+            logger.info("Matched %s source files", matched)
+            self.report_match_results()
+            return matched_files
+
+    def build_match_index(self, catalog: MediaCatalog) -> MatchIndex:
+        self.match_index = MatchIndex(catalog, self.fuzzy_cutoff)
+        return self.match_index
+
+    def report_match_results(self) -> None:
+        """
+        Count and log the fuzzy and ambiguous matches of the match index.
+        """
+        fuzzy = len(self.match_index.fuzzy_matches)
+        ambiguous = len(self.match_index.ambiguous)
+        self.metrics.increment("fuzzy_matches", fuzzy)
+        self.metrics.increment("ambiguous_matches", ambiguous)
+        if fuzzy:
+            logger.info("Matched %s source files by fuzzy title", fuzzy)
+        if ambiguous:
+            logger.warning(
+                "Skipped %s source files matching more than one title", ambiguous
+            )
 
-        return False
+    def _resolve(self, file_path: Path, category: str) -> MediaMatch | None:
+        media_match = self.match_index.resolve(file_path.stem)
+        if media_match is None or media_match.category != category:
+            return None
+        return media_match
 
-    @staticmethod
-    def _match_show_special(file_name: str, show_name: str) -> bool:
-        specials_pattern = re.compile(
-            rf"{re.escape(show_name)} - Specials", re.IGNORECASE
-        )
-        if specials_pattern.match(file_name):
-            return True
+    def create_asset_directories(
+        self,
+        catalog: MediaCatalog,
+        orphans: str | None = None,
+        dry_run: bool = False,
+    ) -> dict[str, dict[str, str]]:
+        """
+        Create an asset folder for every collection, movie and show.
 
-        return False
+        The target directory is listed once and only missing folders are
+        created. With orphans set to "report" or "prune", folders that no
+        longer belong to any collection, movie or show are listed or deleted.
+        A dry run only reports what would be created or pruned.
 
-    @staticmethod
-    def _strip_id(name: str) -> str:
+        Returns:
+            dict (str, dict[str, str]): Asset folder names per category, keyed by
+            the sanitized name of the media a poster file resolves to.
+        """
+        with self.metrics.stage("asset_directories"):
+            return self._create_asset_directories(catalog, orphans, dry_run)
+
+    def _create_asset_directories(
+        self,
+        catalog: MediaCatalog,
+        orphans: str | None,
+        dry_run: bool,
+    ) -> dict[str, dict[str, str]]:
+        asset_folder_names = {"collections": {}, "movies": {}, "shows": {}}
+        if not dry_run:
+            self.target_path.mkdir(parents=True, exist_ok=True)
+        existing_folders = self._list_asset_folders()
+        wanted_folders = set()
+        for item in catalog:
+            sanitized_name = sanitize_name(item.name)
+            wanted_folders.add(sanitized_name)
+            asset_folder_names[item.kind].setdefault(sanitized_name, sanitized_name)
+
+        missing_folders = sorted(wanted_folders - existing_folders)
+        for folder in missing_folders:
+            sub_dir = self.target_path / folder
+            if dry_run:
+                logger.info("Would create directory: %s", sub_dir)
+                continue
+            try:
+                sub_dir.mkdir()
+                logger.debug("Directory created: %s", sub_dir)
+            except FileExistsError:
+                pass
+        if missing_folders and not dry_run:
+            logger.info("Created %s asset folders", len(missing_folders))
+
+        if orphans in ("report", "prune"):
+            self._handle_orphan_folders(
+                existing_folders - wanted_folders,
+                prune=orphans == "prune" and not dry_run,
+            )
+        return asset_folder_names
+
+    def _list_asset_folders(self) -> set[str]:
+        try:
+            with os.scandir(self.target_path) as entries:
+                return {
+                    entry.name
+                    for entry in entries
+                    if not entry.name.startswith(".")
+                    and entry.is_dir(follow_symlinks=False)
+                }
+        except FileNotFoundError:
+            return set()
+
+    def _handle_orphan_folders(self, orphan_folders: set[str], prune: bool) -> None:
         """
-        Strip tvdb/imdb/tmdb ID from movie title.
+        Report asset folders without media and, when pruning, delete the ones
+        that only hold posters, dropping their cache entries in one pass.
         """
-        return re.sub(r"\s*\{.*\}$", "", name)
+        if not orphan_folders:
+            return
+        logger.info("Found %s asset folders without media", len(orphan_folders))
+        pruned = set()
+        for folder in sorted(orphan_folders):
+            sub_dir = self.target_path / folder
+            if not prune:
+                logger.info("Orphaned asset folder: %s", sub_dir)
+                continue
+            if not self._holds_only_posters(sub_dir):
+                logger.info(
+                    "Keeping orphaned asset folder with other files: %s", sub_dir
+                )
+                continue
+            try:
+                shutil.rmtree(sub_dir)
+            except OSError as e:
+                logger.error("Failed to remove %s: %s", sub_dir, e)
+                continue
+            pruned.add(folder)
+            logger.info("Directory removed: %s", sub_dir)
 
-    def create_asset_directories(
-        self, collections_dict: dict[str, list[str]], media_dict: dict[str, list[str]]
-    ) -> dict[str, list[str]]:
-        asset_folder_names = {"collections": [], "movies": [], "shows": []}
-        self.target_path.mkdir(parents=True, exist_ok=True)
-        for key, items in collections_dict.items():
-            for name in items:
-                sanitized_name = sanitize_filename(name)
-                sub_dir = self.target_path / sanitized_name
-                if not sub_dir.exists():
-                    sub_dir.mkdir(exist_ok=True)
-                    print(f"Directory created: {sub_dir}")
-                asset_folder_names["collections"].append(sub_dir.name)
-
-        for key, items in media_dict.items():
-            for name in items:
-                sanitized_name = sanitize_filename(name)
-                sub_dir = self.target_path / sanitized_name
-                if not sub_dir.exists():
-                    sub_dir.mkdir(exist_ok=True)
-                    print(f"Directory created: {sub_dir}")
-                if key == "movies":
-                    asset_folder_names["movies"].append(sanitized_name)
-                if key == "shows":
-                    asset_folder_names["shows"].append(sanitized_name)
+        if pruned:
+            for target_path in list(self.cache.copied_files):
+                target = Path(target_path)
+                if (
+                    target.parent.parent == self.target_path
+                    and target.parent.name in pruned
+                ):
+                    self.cache.remove(target_path)
+            self.save_cache()
 
-        return asset_folder_names
+    def _holds_only_posters(self, directory: Path) -> bool:
+        try:
+            with os.scandir(directory) as entries:
+                return all(
+                    entry.is_file(follow_symlinks=False)
+                    and os.path.splitext(entry.name)[1].lower() in self.image_exts
+                    for entry in entries
+                )
+        except OSError:
+            return False
 
     def copy_rename_files_asset_folders(
         self,
         matched_files: dict[str, list[Path]],
-        asset_folder_names: dict[str, list[str]],
+        asset_folder_names: dict[str, dict[str, str]],
     ) -> None:
+        copy_jobs = self._asset_folder_copy_jobs(matched_files, asset_folder_names)
+        self._run_copy_jobs(copy_jobs)
+
+    def _asset_folder_copy_jobs(
+        self,
+        matched_files: dict[str, list[Path]],
+        asset_folder_names: dict[str, dict[str, str]],
+    ) -> list[tuple[Path, Path, str]]:
+        copy_jobs = []
         for key, items in matched_files.items():
-            if key == "movies":
-                for item in items:
-                    result = self._handle_movie_asset_folders(asset_folder_names, item)
-                    if result:
-                        target_dir, file_name_format = result
-                        self._copy_file(item, target_dir, file_name_format)
+            for item in items:
+                copy_job = self.copy_job(
+                    key, item, asset_folder_names=asset_folder_names
+                )
+                if copy_job:
+                    copy_jobs.append(copy_job)
+        return copy_jobs
 
+    def copy_job(
+        self,
+        key: str,
+        item: Path,
+        asset_folder_names: dict[str, dict[str, str]] | None = None,
+    ) -> tuple[Path, Path, str] | None:
+        """
+        Resolve a matched file to its (source, target dir, file name) copy job,
+        into asset folders when asset_folder_names is given and flat into the
+        target directory otherwise.
+        """
+        if asset_folder_names is not None:
+            result = None
+            if key == "movies":
+                result = self._handle_movie_asset_folders(asset_folder_names, item)
             elif key == "collections":
-                for item in items:
-                    result = self._handle_collection_asset_folders(
-                        asset_folder_names, item
-                    )
-                    if result:
-                        target_dir, file_name_format = result
-                        self._copy_file(item, target_dir, file_name_format)
-
+                result = self._handle_collection_asset_folders(asset_folder_names, item)
             elif key == "shows":
-                for item in items:
-                    result = self._handle_series_asset_folders(asset_folder_names, item)
-                    if result:
-                        target_dir, file_name_format = result
-                        self._copy_file(item, target_dir, file_name_format)
+                result = self._handle_series_asset_folders(asset_folder_names, item)
+            if result:
+                target_dir, file_name_format = result
+                return item, target_dir, self._target_name(item, file_name_format)
+            return None
+
+        file_name_format = None
+        if key == "movies":
+            file_name_format = self._handle_movie(item)
+        elif key == "collections":
+            file_name_format = self._handle_collections(item)
+        elif key == "shows":
+            file_name_format = self._handle_series(item)
+        if file_name_format:
+            return item, self.target_path, self._target_name(item, file_name_format)
+        return None
+
+    def _target_name(self, item: Path, file_name_format: str) -> str:
+        """
+        The target file name, with the extension of the optimized format when
+        posters are optimized.
+        """
+        if self.optimizer is None:
+            return file_name_format
+        return file_name_format.removesuffix(item.suffix) + self.optimizer.suffix
+
+    def optimize_copy_jobs(
+        self, copy_jobs: list[tuple[Path, Path, str]], encode: bool = True
+    ) -> list[tuple[Path, Path, str]]:
+        """
+        Point every copy job at the optimized output of its source, encoding
+        the sources that have none yet. With encode=False (dry runs) sources
+        without an output keep their original file. Jobs whose source fails
+        to encode are dropped.
+        """
+        if self.optimizer is None:
+            return copy_jobs
+        with self.metrics.stage("optimize"):
+            try:
+                return self._optimize_copy_jobs(copy_jobs, encode)
+            finally:
+                self.optimizer.close()
+
+    def _optimize_copy_jobs(
+        self, copy_jobs: list[tuple[Path, Path, str]], encode: bool = True
+    ) -> list[tuple[Path, Path, str]]:
+        results = self.optimizer.optimize([job[0] for job in copy_jobs], encode)
+        optimized_jobs = []
+        for file_path, target_dir, new_file_name in copy_jobs:
+            if file_path not in results:
+                optimized_jobs.append((file_path, target_dir, new_file_name))
+                continue
+            result = results[file_path]
+            if result is None:
+                self.metrics.increment("errors")
+                continue
+            if result.encoded:
+                self.metrics.increment("files_optimized")
+                self.metrics.increment(
+                    "bytes_saved", result.source_size - result.output_size
+                )
+            optimized_jobs.append((Path(result.output), target_dir, new_file_name))
+        return optimized_jobs
 
     def _handle_movie_asset_folders(
-        self, asset_folder_names: dict[str, list[str]], file_path: Path
+        self, asset_folder_names: dict[str, dict[str, str]], file_path: Path
     ) -> tuple[Path, str]:
-        for name in asset_folder_names["movies"]:
-            if file_path.exists() and file_path.is_file() and file_path.stem == name:
-                movie_file_name_format = f"Poster{file_path.suffix}"
-                target_dir = self.target_path / name
-                return target_dir, movie_file_name_format
+        media_match = self._resolve(file_path, "movies")
+        if media_match is None:
+            return None
+        name = asset_folder_names["movies"].get(sanitize_name(media_match.name))
+        if name is not None and self._is_source_file(file_path):
+            movie_file_name_format = f"Poster{file_path.suffix}"
+            target_dir = self.target_path / name
+            return target_dir, movie_file_name_format
         return None
 
     def _handle_collection_asset_folders(
-        self, asset_folder_names: dict[str, list[str]], file_path: Path
+        self, asset_folder_names: dict[str, dict[str, str]], file_path: Path
     ) -> tuple[Path, str]:
-        for name in asset_folder_names["collections"]:
-            stripped_file_name = file_path.stem.removesuffix(" Collection")
-            if (
-                file_path.exists()
-                and file_path.is_file()
-                and stripped_file_name == name
-            ):
-                collection_file_name_format = f"Poster{file_path.suffix}"
-                target_dir = self.target_path / name
-                return target_dir, collection_file_name_format
+        media_match = self._resolve(file_path, "collections")
+        if media_match is None:
+            return None
+        name = asset_folder_names["collections"].get(sanitize_name(media_match.name))
+        if name is not None and self._is_source_file(file_path):
+            collection_file_name_format = f"Poster{file_path.suffix}"
+            target_dir = self.target_path / name
+            return target_dir, collection_file_name_format
         return None
 
     def _handle_series_asset_folders(
-        self, asset_folder_names: dict[str, list[str]], file_path: Path
+        self, asset_folder_names: dict[str, dict[str, str]], file_path: Path
     ) -> tuple[Path, str]:
-        match_season = re.match(r"(.+?) - Season (\d+)", file_path.stem)
-        match_specials = re.match(r"(.+?) - Specials", file_path.stem)
-        if match_season:
-            show_name_season = match_season.group(1)
-            season_num = int(match_season.group(2))
-            formatted_season_num = f"Season{season_num:02}"
-            for name in asset_folder_names["shows"]:
-                stripped_name = self._strip_id(name)
-                if (
-                    file_path.exists()
-                    and file_path.is_file()
-                    and show_name_season == stripped_name
-                ):
-                    target_dir = self.target_path / name
-                    show_file_name_season_format = (
-                        f"{formatted_season_num}{file_path.suffix}"
-                    )
-                    return target_dir, show_file_name_season_format
+        media_match = self._resolve(file_path, "shows")
+        if media_match is None:
             return None
-
-        elif match_specials:
-            show_name_specials = match_specials.group(1)
-            for name in asset_folder_names["shows"]:
-                stripped_name = self._strip_id(name)
-                if (
-                    file_path.exists()
-                    and file_path.is_file()
-                    and show_name_specials == stripped_name
-                ):
-                    target_dir = self.target_path / name
-                    show_file_name_special_format = f"Season00{file_path.suffix}"
-                    return target_dir, show_file_name_special_format
+        name = asset_folder_names["shows"].get(sanitize_name(media_match.name))
+        if name is None or not self._is_source_file(file_path):
             return None
 
+        poster_name = parse_poster_name(file_path.stem)
+
+        if poster_name.season is not None:
+            show_file_name_format = f"Season{poster_name.season:02}{file_path.suffix}"
+        elif poster_name.specials:
+            show_file_name_format = f"Season00{file_path.suffix}"
         else:
-            for name in asset_folder_names["shows"]:
-                stripped_name = self._strip_id(name)
-                if (
-                    file_path.exists()
-                    and file_path.is_file()
-                    and file_path.stem == stripped_name
-                ):
-                    target_dir = self.target_path / name
-                    show_file_name_format = f"Poster{file_path.suffix}"
-                    return target_dir, show_file_name_format
-            return None
+            show_file_name_format = f"Poster{file_path.suffix}"
+        target_dir = self.target_path / name
+        return target_dir, show_file_name_format
 
-    def _copy_file(self, file_path: Path, target_dir: Path, new_file_name: str) -> None:
-        try:
-            target_path = target_dir / new_file_name
-            file_hash = self.hash_file(file_path)
-            cached_file = self.cache["copied_files"].get(str(target_path))
-            current_source = str(file_path)
+    def _run_copy_jobs(self, copy_jobs: list[tuple[Path, Path, str]]) -> None:
+        self.apply_plan(self.plan_copy_jobs(self.optimize_copy_jobs(copy_jobs)))
 
-            if target_path.exists() and cached_file:
-                cached_hash = cached_file["hash"]
-                cached_source = cached_file["source_path"]
+    def plan(
+        self,
+        matched_files: dict[str, list[Path]],
+        asset_folder_names: dict[str, dict[str, str]] | None = None,
+        source_files: dict[str, list[Path]] | None = None,
+        dry_run: bool = False,
+    ) -> SyncPlan:
+        """
+        Plan copying the matched files, into asset folders when
+        asset_folder_names is given. When source_files is given, cache entries
+        of sources that no longer exist are planned for deletion.
 
-                if file_hash != cached_hash or cached_source != current_source:
-                    print(
-                        f"Replacing file from {cached_source}: {file_path.name} -> {target_path}"
+        Posters are optimized first when an optimizer is set, except in a
+        dry run, which only uses outputs that already exist.
+        """
+        if asset_folder_names is not None:
+            copy_jobs = self._asset_folder_copy_jobs(matched_files, asset_folder_names)
+        else:
+            copy_jobs = self._copy_jobs(matched_files)
+        copy_jobs = self.optimize_copy_jobs(copy_jobs, encode=not dry_run)
+        source_file_paths = None
+        if source_files is not None:
+            source_file_paths = {
+                str(file) for file_list in source_files.values() for file in file_list
+            }
+        return self.plan_copy_jobs(copy_jobs, source_file_paths)
+
+    def plan_copy_jobs(
+        self,
+        copy_jobs: list[tuple[Path, Path, str]],
+        source_file_paths: set[str] | None = None,
+    ) -> SyncPlan:
+        """
+        Decide what to do for every copy job from the cache and the target
+        directories, without reading any poster. A directory holding several
+        planned targets (the flat layout) is listed once; a lone target, as in
+        an asset folder, is checked with a single lstat instead of a listing.
+
+        When several sources map to the same target, the first one in matching
+        order (source directory priority) wins, so each target has exactly one
+        writer and repeated runs resolve the conflict the same way.
+        """
+        with self.metrics.stage("plan"):
+            plan = SyncPlan()
+            target_listings: dict[Path, set[str]] = {}
+            targets_per_dir = Counter(target_dir for _, target_dir, _ in copy_jobs)
+            claimed_targets: dict[Path, Path] = {}
+            for file_path, target_dir, new_file_name in copy_jobs:
+                target_path = target_dir / new_file_name
+                if target_path in claimed_targets:
+                    plan.add(
+                        "skip",
+                        target_path,
+                        file_path,
+                        f"already provided by {claimed_targets[target_path]}",
                     )
-                    shutil.copy2(file_path, target_path)
-                    self.cache["copied_files"][str(target_path)] = {
-                        "hash": file_hash,
-                        "source_path": current_source,
-                    }
-                    self.save_cache()
+                    continue
+                claimed_targets[target_path] = file_path
+                if targets_per_dir[target_dir] == 1:
+                    target_exists = os.path.lexists(target_path)
+                else:
+                    if target_dir not in target_listings:
+                        target_listings[target_dir] = self._list_target_dir(target_dir)
+                    target_exists = new_file_name in target_listings[target_dir]
+                plan.add(*self._plan_action(file_path, target_path, target_exists))
+
+            if source_file_paths is not None:
+                self._plan_orphans(plan, source_file_paths, claimed_targets)
+            return plan
+
+    def _plan_orphans(
+        self,
+        plan: SyncPlan,
+        source_file_paths: set[str],
+        claimed_targets: dict | None = None,
+    ) -> None:
+        """
+        Plan the cleanup of cache entries whose source no longer exists.
+
+        With remove_orphans set, their posters are deleted as well, and when
+        the targets claimed by this run are known, so are the posters of
+        sources that no longer match any media or now map to another target.
+        Targets are found through the cache's reverse index, so nothing is
+        read from the target directory.
+
+        Nothing is cleaned up when a source directory could not be scanned
+        (see failed_sources): its posters would look deleted.
+        """
+        if self.failed_sources:
+            logger.warning(
+                "Not cleaning up orphaned posters, failed to scan: %s",
+                ", ".join(sorted(self.failed_sources)),
+            )
+            return
+        action = "delete" if self.remove_orphans else "forget"
+        if self.optimizer is not None:
+            source_file_paths = source_file_paths | self.optimizer.outputs_for(
+                source_file_paths
+            )
+        claimed = {
+            str(target): str(source)
+            for target, source in (claimed_targets or {}).items()
+        }
+        cached_sources = self.cache.sources()
+        for source_path in sorted(cached_sources - source_file_paths):
+            for target_path in sorted(self.cache.targets_for(source_path)):
+                if target_path not in claimed:
+                    plan.add(
+                        action,
+                        Path(target_path),
+                        Path(source_path),
+                        "source no longer exists",
+                    )
+
+        if not self.remove_orphans or claimed_targets is None:
+            return
+        claimed_sources = set(claimed.values())
+        for source_path in sorted(cached_sources & source_file_paths):
+            for target_path in sorted(self.cache.targets_for(source_path)):
+                if target_path in claimed:
+                    continue
+                if source_path in claimed_sources:
+                    reason = "source now maps to another target"
                 else:
-                    print(f"Skipping unchanged file: {file_path}")
-                    return
+                    reason = "source no longer matches any media"
+                plan.add("delete", Path(target_path), Path(source_path), reason)
 
+    @staticmethod
+    def _list_target_dir(target_dir: Path) -> set[str]:
+        try:
+            with os.scandir(target_dir) as entries:
+                return {entry.name for entry in entries}
+        except FileNotFoundError:
+            return set()
+
+    def _plan_action(
+        self, file_path: Path, target_path: Path, target_exists: bool
+    ) -> PlannedAction:
+        size = self._source_stat(file_path).st_size
+        cached_file = self.cache.get(str(target_path))
+        if not target_exists:
+            reason = "target missing" if cached_file else "new target"
+            return PlannedAction("copy", target_path, file_path, reason, size)
+        if not cached_file:
+            return PlannedAction(
+                "replace", target_path, file_path, "target not in cache", size
+            )
+        if cached_file["source_path"] != str(file_path):
+            return PlannedAction(
+                "replace",
+                target_path,
+                file_path,
+                f"source changed from {cached_file['source_path']}",
+                size,
+            )
+        if cached_file.get("fingerprint") != self._fingerprint(file_path):
+            return PlannedAction(
+                "replace", target_path, file_path, "source modified", size
+            )
+        if self.verify_hashes:
+            return PlannedAction("replace", target_path, file_path, "verify hash", size)
+        return PlannedAction("skip", target_path, file_path, "unchanged")
+
+    def apply_plan(self, plan: SyncPlan) -> None:
+        """
+        Apply a plan on a pool of copy_workers threads. Actions are handed out
+        in batches per target directory, and cache deletions are applied
+        together at the end.
+        """
+        with self.metrics.stage("copy"):
+            deduplicated = self.metrics.counters["bytes_deduplicated"]
+            batches = []
+            deletes = []
+            for actions in plan.by_target_dir().values():
+                pending = []
+                for action in actions:
+                    if action.action in ("delete", "forget"):
+                        deletes.append(action)
+                    else:
+                        pending.append(action)
+                for start in range(0, len(pending), APPLY_BATCH_SIZE):
+                    batches.append(pending[start : start + APPLY_BATCH_SIZE])
+
+            if self.copy_workers <= 1:
+                for batch in batches:
+                    self._apply_actions(batch)
             else:
-                shutil.copy2(file_path, target_path)
-                self.cache["copied_files"][str(target_path)] = {
-                    "hash": file_hash,
-                    "source_path": current_source,
-                }
-                print(f"Copied and renamed: {file_path.name} -> {target_path}")
-                self.save_cache()
+                with ThreadPoolExecutor(max_workers=self.copy_workers) as executor:
+                    futures = {
+                        executor.submit(self._apply_actions, batch): batch
+                        for batch in batches
+                    }
+                    for future in as_completed(futures):
+                        error = future.exception()
+                        if error is not None:
+                            self.metrics.increment("errors")
+                            logger.error(
+                                "Failed to apply %s actions in %s: %s",
+                                len(futures[future]),
+                                futures[future][0].target.parent,
+                                error,
+                                exc_info=error,
+                            )
+            deduplicated = self.metrics.counters["bytes_deduplicated"] - deduplicated
+            if deduplicated:
+                logger.info(
+                    "Linked duplicate posters instead of copying them, reclaiming %.1f MiB",
+                    deduplicated / 1024 / 1024,
+                )
+
+            removed = 0
+            for action in deletes:
+                cached_file = self.cache.get(str(action.target))
+                if not cached_file or cached_file["source_path"] != str(action.source):
+                    continue
+                if action.action == "delete":
+                    removed += self._remove_target(action)
+                self.cache.remove(str(action.target))
+            if deletes:
+                logger.info("Removed %s deleted files from cache", len(deletes))
+            if removed:
+                logger.info("Removed %s orphaned posters", removed)
+            self.save_cache()
+
+    def _remove_target(self, action: PlannedAction) -> int:
+        try:
+            action.target.unlink()
+        except FileNotFoundError:
+            return 0
+        except OSError as e:
+            self.metrics.increment("errors")
+            logger.error("Failed to remove %s: %s", action.target, e)
+            return 0
+        self.metrics.increment("files_removed")
+        logger.debug("Removed %s (%s)", action.target, action.reason)
+        return 1
+
+    def _apply_actions(self, actions: list[PlannedAction]) -> None:
+        for action in actions:
+            self._apply_action(action)
+
+    def _copy_file(self, file_path: Path, target_dir: Path, new_file_name: str) -> None:
+        target_path = target_dir / new_file_name
+        self._apply_action(
+            self._plan_action(file_path, target_path, target_path.exists())
+        )
+
+    def _apply_action(self, action: PlannedAction) -> None:
+        """
+        Carry out a copy, replace or skip action. The source is hashed while it
+        is staged next to the target, so it is read once, and a replaced poster
+        is only renamed into place when its contents changed. A verify_hashes
+        check of an unchanged source is hashed without staging it, as it
+        nearly always finds the same contents.
+
+        With dedupe set, a source whose contents may already be in the target
+        directory (a cached target of the same size) is hashed first, and
+        placed by linking an identical target instead of being copied.
+        """
+        file_path = action.source
+        target_path = action.target
+        if action.action == "skip":
+            if action.reason == "unchanged":
+                self.metrics.increment("cache_hits")
+                logger.debug("Skipping unchanged file: %s", file_path)
+            else:
+                self.metrics.increment("conflicts")
+                logger.debug(
+                    "Skipping %s: %s is %s", file_path, target_path, action.reason
+                )
+            return
+        staged = None
+        try:
+            cached_file = self.cache.get(str(target_path))
+            current_source = str(file_path)
+            source_stat = self._source_stat(file_path)
+            fingerprint = self._fingerprint(file_path)
+            entry = {
+                "hash": None,
+                "algorithm": self.hash_algorithm,
+                "source_path": current_source,
+                "fingerprint": fingerprint,
+            }
+            may_be_unchanged = (
+                action.action == "replace"
+                and cached_file is not None
+                and cached_file["source_path"] == current_source
+                and cached_file.get("algorithm", HASH_ALGORITHM) == self.hash_algorithm
+            )
+            if self.dedupe:
+                verifying = self.verify_hashes or action.reason == "verify hash"
+                entry["hash"] = self._content_hash(
+                    file_path, fingerprint, use_cached=not verifying
+                )
+            if (
+                entry["hash"] is None
+                and may_be_unchanged
+                and action.reason == "verify hash"
+            ):
+                # Verifying rarely finds a change, so the source is hashed
+                # before anything is staged instead of writing a copy that
+                # would be thrown away.
+                entry["hash"] = self.hash_file(file_path)
+                self.metrics.increment("hashes_computed")
+                self.metrics.increment("bytes_hashed", fingerprint[0])
+            if entry["hash"] is None:
+                hasher = hashlib.new(self.hash_algorithm)
+                staged = self.placer.stage(file_path, target_path, source_stat, hasher)
+                self.metrics.increment("hashes_computed")
+                self.metrics.increment("bytes_hashed", fingerprint[0])
+                entry["hash"] = hasher.hexdigest()
+
+            if may_be_unchanged and cached_file["hash"] == entry["hash"]:
+                if staged is not None:
+                    staged.discard()
+                self.metrics.increment("cache_hits")
+                logger.debug("Skipping unchanged file: %s", file_path)
+                if cached_file.get("fingerprint") != fingerprint:
+                    self.cache.set(str(target_path), entry)
+                return
+
+            duplicate = None
+            if staged is None and self.dedupe:
+                duplicate, staged = self._stage_duplicate(entry, target_path)
+            if staged is None:
+                staged = self.placer.stage(file_path, target_path, source_stat)
+            staged.commit()
+
+            if duplicate is not None:
+                placement_note = f" ({staged.method} to duplicate {duplicate})"
+            else:
+                placement_note = self._placement_note(staged.method)
+            if action.action == "replace" and cached_file:
+                self.metrics.increment("files_replaced")
+                logger.debug(
+                    "Replacing file from %s: %s -> %s%s",
+                    cached_file["source_path"],
+                    file_path.name,
+                    target_path,
+                    placement_note,
+                )
+            else:
+                self.metrics.increment("files_copied")
+                logger.debug(
+                    "Copied and renamed: %s -> %s%s",
+                    file_path.name,
+                    target_path,
+                    placement_note,
+                )
+            if duplicate is not None:
+                if staged.method != "same":
+                    self.metrics.increment("files_deduplicated")
+                    self.metrics.increment("bytes_deduplicated", fingerprint[0])
+            elif staged.method != "same":
+                self.metrics.increment("bytes_copied", fingerprint[0])
+            self.cache.set(str(target_path), entry)
 
         except Exception as e:
-            print(f"Error copying file {file_path} to {target_path}: {e}")
+            if staged is not None:
+                staged.discard()
+            self.metrics.increment("errors")
+            logger.error("Error copying file %s to %s: %s", file_path, target_path, e)
+
+    def _content_hash(
+        self, file_path: Path, fingerprint: list[int], use_cached: bool = True
+    ) -> str | None:
+        """
+        Hash of a source when it can be known before copying it: recorded in
+        the cache for the unchanged source (unless use_cached is False, when
+        verifying hashes), or computed now when a cached target of the same
+        size may hold the same content. None otherwise, so unique posters are
+        still read only once.
+        """
+        content_hash = None
+        if use_cached:
+            content_hash = self.cache.hash_for_source(
+                str(file_path), fingerprint, self.hash_algorithm
+            )
+        if content_hash is not None or not self.cache.has_size(fingerprint[0]):
+            return content_hash
+        self.metrics.increment("hashes_computed")
+        self.metrics.increment("bytes_hashed", fingerprint[0])
+        return self.hash_file(file_path)
+
+    def _stage_duplicate(
+        self, entry: dict, target_path: Path
+    ) -> tuple[str | None, object | None]:
+        """
+        Stage a link to a cached target with the same content as entry.
+        A candidate is only used while its size and mtime still match the
+        source it was copied from, i.e. it was not modified in place.
 
-    def copy_rename_files(
-        self,
-        matched_files: dict[str, list[Path]],
-        collections_dict: dict[str, list[str]],
-    ) -> None:
-        for key, items in matched_files.items():
-            if key == "movies":
-                for item in items:
-                    result = self._handle_movie(item)
-                    if result:
-                        file_name_format = result
-                        self._copy_file(item, self.target_path, file_name_format)
-
-            if key == "collections":
-                for item in items:
-                    result = self._handle_collections(collections_dict, item)
-                    if result:
-                        file_name_format = result
-                        self._copy_file(item, self.target_path, file_name_format)
-
-            if key == "shows":
-                for item in items:
-                    result = self._handle_series(item)
-                    if result:
-                        file_name_format = result
-                        self._copy_file(item, self.target_path, file_name_format)
+        A candidate that is a hardlink to its own source is only reflinked:
+        a hardlink would tie this target to another poster's source, and an
+        in-place edit of that source would change it unnoticed.
+        """
+        for duplicate in self.cache.duplicates_of(
+            entry["fingerprint"][0], self.hash_algorithm, entry["hash"]
+        ):
+            if duplicate == str(target_path):
+                continue
+            cached_file = self.cache.get(duplicate)
+            try:
+                duplicate_stat = os.stat(duplicate)
+            except OSError:
+                continue
+            if (
+                cached_file is None
+                or [
+                    duplicate_stat.st_size,
+                    duplicate_stat.st_mtime_ns,
+                ]
+                != cached_file["fingerprint"][:2]
+            ):
+                continue
+            try:
+                shares_source = os.path.samestat(
+                    duplicate_stat, os.stat(cached_file["source_path"])
+                )
+            except OSError:
+                shares_source = duplicate_stat.st_nlink > 1
+            staged = self.placer.link(
+                Path(duplicate),
+                target_path,
+                duplicate_stat,
+                ("reflink",) if shares_source else LINK_METHODS,
+            )
+            if staged is not None:
+                return duplicate, staged
+        return None, None
 
     @staticmethod
-    def _handle_movie(item: Path) -> str:
-        if item.exists() and item.is_file():
+    def _placement_note(method: str) -> str:
+        """
+        How a file was placed, for the log ("" for a plain copy).
+        """
+        if method == "copy":
+            return ""
+        if method == "same":
+            return " (already linked)"
+        return f" ({method})"
+
+    def copy_rename_files(self, matched_files: dict[str, list[Path]]) -> None:
+        copy_jobs = self._copy_jobs(matched_files)
+        self._run_copy_jobs(copy_jobs)
+
+    def _copy_jobs(
+        self, matched_files: dict[str, list[Path]]
+    ) -> list[tuple[Path, Path, str]]:
+        copy_jobs = []
+        for key, items in matched_files.items():
+            for item in items:
+                copy_job = self.copy_job(key, item)
+                if copy_job:
+                    copy_jobs.append(copy_job)
+        return copy_jobs
+
+    def _handle_movie(self, item: Path) -> str:
+        if self._resolve(item, "movies") and self._is_source_file(item):
             file_name_format = f"{item.name}"
             return file_name_format
         return None
 
-    @staticmethod
-    def _handle_collections(collections_dict: dict[str, list[str]], item: Path) -> str:
-        collections_list = [
-            item for sublist in collections_dict.values() for item in sublist
-        ]
-        stripped_name = item.stem.removesuffix(" Collection")
-        for collection_name in collections_list:
-            if collection_name == stripped_name:
-                if item.exists() and item.is_file():
-                    file_name_format = f"{collection_name}{item.suffix}"
-                    return file_name_format
+    def _handle_collections(self, item: Path) -> str:
+        media_match = self._resolve(item, "collections")
+        if media_match and self._is_source_file(item):
+            file_name_format = f"{media_match.name}{item.suffix}"
+            return file_name_format
         return None
 
-    @staticmethod
-    def _handle_series(item: Path) -> str:
-        match_season = re.match(r"(.+?) - Season (\d+)", item.stem)
-        match_specials = re.match(r"(.+?) - Specials", item.stem)
-
-        if match_season:
-            show_name_season = match_season.group(1)
-            season_num = int(match_season.group(2))
-            formatted_season_num = f"Season{season_num:02}"
-            if item.exists() and item.is_file():
-                file_name_format = (
-                    f"{show_name_season}_{formatted_season_num}{item.suffix}"
-                )
-                return file_name_format
+    def _handle_series(self, item: Path) -> str:
+        if not self._resolve(item, "shows") or not self._is_source_file(item):
             return None
-        elif match_specials:
-            show_name_specials = match_specials.group(1)
-            if item.exists() and item.is_file():
-                file_name_format = f"{show_name_specials}_Season00{item.suffix}"
-                return file_name_format
-            return None
-        else:
-            if item.exists() and item.is_file():
-                file_name_format = f"{item.name}"
-                return file_name_format
-        return None
\ No newline at end of file
+        poster_name = parse_poster_name(item.stem)
+        if poster_name.season is not None:
+            return f"{poster_name.title}_Season{poster_name.season:02}{item.suffix}"
+        if poster_name.specials:
+            return f"{poster_name.title}_Season00{item.suffix}"
+        return f"{item.name}"
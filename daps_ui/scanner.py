@@ -0,0 +1,91 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def iter_directory(
+    directory: Path,
+    image_exts: set[str],
+    recursive: bool = False,
+    failed: set[str] | None = None,
+):
+    """
+    Yield (path, stat result) for the image files of a directory.
+
+    Uses os.scandir so file types come from the directory listing; only image
+    files are stat'ed, once. Files come in name order, followed by the files of
+    subdirectories (in name order) when recursive. Only one directory listing
+    is held in memory at a time.
+
+    A directory that cannot be listed is logged and added to failed, so
+    callers can tell an unreadable directory from an empty one.
+    """
+    subdirectories = []
+    try:
+        with os.scandir(directory) as entries:
+            sorted_entries = sorted(entries, key=lambda entry: entry.name)
+    except OSError as e:
+        logger.error("Failed to scan %s: %s", directory, e)
+        if failed is not None:
+            failed.add(str(directory))
+        return
+
+    for entry in sorted_entries:
+        try:
+            if recursive and entry.is_dir(follow_symlinks=False):
+                subdirectories.append(entry.path)
+                continue
+            if os.path.splitext(entry.name)[1].lower() not in image_exts:
+                continue
+            if not entry.is_file():
+                continue
+            entry_stat = entry.stat()
+        except OSError:
+            continue
+        yield Path(entry.path), entry_stat
+    del sorted_entries
+
+    for subdirectory in subdirectories:
+        yield from iter_directory(Path(subdirectory), image_exts, recursive, failed)
+
+
+def scan_directory(
+    directory: Path,
+    image_exts: set[str],
+    recursive: bool = False,
+    failed: set[str] | None = None,
+) -> list[tuple[Path, os.stat_result]]:
+    """
+    List the image files of a directory with their stat results.
+    """
+    return list(iter_directory(directory, image_exts, recursive, failed))
+
+
+def scan_directories(
+    directories: list[Path],
+    image_exts: set[str],
+    recursive: bool = False,
+    failed: set[str] | None = None,
+) -> list[list[tuple[Path, os.stat_result]]]:
+    """
+    Scan several directories concurrently, returning their results in the
+    order the directories were given. Directories that cannot be listed are
+    added to failed.
+    """
+    if len(directories) <= 1:
+        return [
+            scan_directory(directory, image_exts, recursive, failed)
+            for directory in directories
+        ]
+    with ThreadPoolExecutor(max_workers=len(directories)) as executor:
+        return list(
+            executor.map(
+                lambda directory: scan_directory(
+                    directory, image_exts, recursive, failed
+                ),
+                directories,
+            )
+        )
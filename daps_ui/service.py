@@ -0,0 +1,147 @@
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+from daps_ui.utils import SessionPool
+
+SERVICE_INTERVAL = 3600
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8585
+
+logger = logging.getLogger(__name__)
+
+
+class PosterService:
+    """
+    Keeps running and runs a job every interval seconds and whenever it is
+    triggered over HTTP (POST /run), one run at a time. Triggers that arrive
+    while a run is in progress are coalesced into a single follow-up run.
+
+    The config file is reloaded before a run when it changed, and the job is
+    given a SessionPool that lives as long as the service, so connections to
+    the instances are kept alive between runs.
+    """
+
+    def __init__(
+        self,
+        config: object,
+        job: Callable[[object, SessionPool], None],
+        interval: float | None = None,
+        host: str | None = None,
+        port: int | None = None,
+        token: str | None = None,
+    ):
+        self.config = config
+        self.job = job
+        self.interval = interval or SERVICE_INTERVAL
+        self.host = host or SERVICE_HOST
+        self.port = port or SERVICE_PORT
+        self.token = token
+        self.sessions = SessionPool()
+        self.running = False
+        self.runs = 0
+        self.last_started = None
+        self.last_finished = None
+        self.last_error = None
+        self.next_run = time.time()
+        self._requested = threading.Event()
+        self._stopped = threading.Event()
+        self._server = None
+
+    def trigger(self) -> bool:
+        """
+        Request a run. Returns True when it was coalesced with a run that is
+        in progress or already requested: one more run follows, however often
+        this is called.
+        """
+        pending = self._requested.is_set()
+        self._requested.set()
+        return self.running or pending
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._requested.set()
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "pending": self._requested.is_set(),
+            "runs": self.runs,
+            "last_started": self.last_started,
+            "last_finished": self.last_finished,
+            "last_error": self.last_error,
+            "next_run": self.next_run,
+        }
+
+    def run(self) -> None:
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        server_thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        server_thread.start()
+        logger.info(
+            "Service listening on http://%s:%s, running every %ss",
+            self.host,
+            self.port,
+            self.interval,
+        )
+        try:
+            while not self._stopped.is_set():
+                self._requested.wait(max(0.0, self.next_run - time.time()))
+                if self._stopped.is_set():
+                    break
+                self._requested.clear()
+                self._run_job()
+                self.next_run = time.time() + self.interval
+        finally:
+            self._server.shutdown()
+            self._server.server_close()
+            self.sessions.close()
+
+    def _run_job(self) -> None:
+        if self.config.reload_if_changed():
+            logger.info("Reloaded config from %s", self.config.config_path)
+        self.config.failed_instances = set()
+        self.running = True
+        self.last_started = time.time()
+        try:
+            self.job(self.config, self.sessions)
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            logger.exception("Run failed: %s", e)
+        finally:
+            self.running = False
+            self.runs += 1
+            self.last_finished = time.time()
+
+    def _handler(self) -> type:
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/status":
+                    return self._reply(404, {"error": "not found"})
+                self._reply(200, service.status())
+
+            def do_POST(self):
+                if self.path.rstrip("/") != "/run":
+                    return self._reply(404, {"error": "not found"})
+                if service.token and self.headers.get("X-Api-Key") != service.token:
+                    return self._reply(401, {"error": "invalid api key"})
+                coalesced = service.trigger()
+                self._reply(202, {"queued": True, "coalesced": coalesced})
+
+            def _reply(self, code: int, body: dict) -> None:
+                data = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                logger.debug("%s %s", self.address_string(), format % args)
+
+        return Handler
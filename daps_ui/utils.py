@@ -1,16 +1,41 @@
-def get_combined_media_lists(radarr_instances: dict[str, list[object]], sonarr_instances: dict[str, list[object]]) -> tuple[list, list]:
-    all_movies = []
-    all_series = []
-    for radarr in radarr_instances.values():
-        all_movies.extend(radarr.movies)
-    for sonarr in sonarr_instances.values():
-        all_series.extend(sonarr.series)
-    return all_movies, all_series
-
-def get_combined_collections_lists(plex_instances: dict[str, list[object]]) -> tuple[list, list]:
-    all_movie_collections = []
-    all_series_collections = []
-    for plex in plex_instances.values():
-        all_movie_collections.extend(plex.movie_collections)
-        all_series_collections.extend(plex.series_collections)
-    return all_movie_collections, all_series_collections
\ No newline at end of file
+import requests
+
+
+class TimeoutSession(requests.Session):
+    """
+    requests session that applies a default timeout to every request.
+    """
+
+    def __init__(self, timeout: float | None = None):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, *args, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(*args, **kwargs)
+
+class SessionPool:
+    """
+    One keep-alive TimeoutSession per instance, kept across runs so a
+    long-running process reuses its connections instead of reconnecting to
+    every instance on every run.
+    """
+
+    def __init__(self):
+        self.sessions = {}
+
+    def get(self, name: str, url: str, timeout: float | None = None) -> TimeoutSession:
+        session = self.sessions.get(name)
+        if session is None or session.url != url:
+            if session is not None:
+                session.close()
+            session = TimeoutSession(timeout)
+            session.url = url
+            self.sessions[name] = session
+        session.timeout = timeout
+        return session
+
+    def close(self) -> None:
+        for session in self.sessions.values():
+            session.close()
+        self.sessions = {}
\ No newline at end of file
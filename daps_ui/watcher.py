@@ -0,0 +1,353 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import stat
+import struct
+import sys
+import time
+from pathlib import Path
+
+from daps_ui.scanner import scan_directories
+
+WATCH_DEBOUNCE = 2.0
+WATCH_MAX_DELAY = 30.0
+POLL_INTERVAL = 5.0
+
+logger = logging.getLogger(__name__)
+
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+INOTIFY_MASK = (
+    IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+)
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class PollingWatcher:
+    """
+    Detects changed posters by comparing scandir snapshots (size, mtime) of
+    the watched directories. Works everywhere, including network shares where
+    inotify does not see remote writes. The directories are rescanned once
+    every interval, however often wait is called.
+    """
+
+    def __init__(
+        self,
+        directories: list[Path],
+        image_exts: set[str],
+        recursive: bool = False,
+        interval: float = POLL_INTERVAL,
+    ):
+        self.directories = [Path(directory) for directory in directories]
+        self.image_exts = image_exts
+        self.recursive = recursive
+        self.interval = interval
+        self._snapshot = self._scan()
+        self._last_scan = time.monotonic()
+
+    def _scan(self, failed: set[str] | None = None) -> dict[Path, tuple[int, int]]:
+        scanned = scan_directories(
+            self.directories, self.image_exts, self.recursive, failed
+        )
+        return {
+            path: (path_stat.st_size, path_stat.st_mtime_ns)
+            for files in scanned
+            for path, path_stat in files
+        }
+
+    def wait(self, timeout: float) -> set[Path]:
+        remaining = self._last_scan + self.interval - time.monotonic()
+        if remaining > timeout:
+            time.sleep(timeout)
+            return set()
+        time.sleep(max(remaining, 0))
+        self._last_scan = time.monotonic()
+        failed = set()
+        snapshot = self._scan(failed)
+        if failed:
+            # An unreadable directory is not a deleted one; keep the last
+            # snapshot until it can be listed again.
+            return set()
+        changed = {
+            path
+            for path in snapshot.keys() | self._snapshot.keys()
+            if snapshot.get(path) != self._snapshot.get(path)
+        }
+        self._snapshot = snapshot
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """
+    Linux inotify watcher over libc, reporting files that were written,
+    moved or deleted in the watched directories. When recursive, directories
+    created later are watched as soon as they appear.
+    """
+
+    def __init__(self, directories: list[Path], recursive: bool = False):
+        libc_name = ctypes.util.find_library("c")
+        if not sys.platform.startswith("linux") or not libc_name:
+            raise OSError("inotify is not available on this platform")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.recursive = recursive
+        self.overflowed = False
+        self._directories: dict[int, Path] = {}
+        try:
+            for directory in directories:
+                self._add_watch(Path(directory))
+        except OSError:
+            self.close()
+            raise
+
+    def _add_watch(self, directory: Path) -> None:
+        wd = self._libc.inotify_add_watch(
+            self._fd, os.fsencode(directory), INOTIFY_MASK
+        )
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"Cannot watch {directory}")
+        self._directories[wd] = directory
+        if self.recursive:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        self._add_watch(Path(entry.path))
+
+    def _watch_new_directory(self, directory: Path, changed: set[Path]) -> None:
+        try:
+            self._add_watch(directory)
+        except OSError as e:
+            logger.warning("Cannot watch %s: %s", directory, e)
+            return
+        for root, _, files in os.walk(directory):
+            changed.update(Path(root) / file for file in files)
+
+    def wait(self, timeout: float) -> set[Path]:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        changed = set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = data[offset : offset + name_length].rstrip(b"\0")
+            offset += name_length
+            if mask & IN_Q_OVERFLOW:
+                self.overflowed = True
+            directory = self._directories.get(wd)
+            if directory is None or not name:
+                continue
+            path = directory / os.fsdecode(name)
+            if mask & IN_ISDIR:
+                if self.recursive and mask & (IN_CREATE | IN_MOVED_TO):
+                    self._watch_new_directory(path, changed)
+            elif not mask & IN_CREATE:
+                changed.add(path)
+        return changed
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_watcher(
+    directories: list[Path],
+    image_exts: set[str],
+    recursive: bool = False,
+    mode: str = "auto",
+    poll_interval: float = POLL_INTERVAL,
+) -> InotifyWatcher | PollingWatcher:
+    """
+    Create an inotify watcher, falling back to polling when inotify is not
+    available. mode can force "inotify" or "poll".
+    """
+    if mode == "poll":
+        return PollingWatcher(directories, image_exts, recursive, poll_interval)
+    try:
+        return InotifyWatcher(directories, recursive)
+    except OSError as e:
+        if mode == "inotify":
+            raise
+        logger.warning(
+            "inotify unavailable (%s), polling every %ss instead", e, poll_interval
+        )
+        return PollingWatcher(directories, image_exts, recursive, poll_interval)
+
+
+class PosterWatcher:
+    """
+    Keeps a PosterRenamerr's match index and asset folder map in memory and
+    only matches and copies source posters that were added, modified or
+    deleted. Events are debounced so a dropped poster pack is handled as one
+    batch, bounded by max_delay.
+
+    Every poster the renamer scanned is known by name, in source directory
+    priority order, so deleting the poster in use falls back to the next
+    directory holding one, as a batch run would.
+    """
+
+    def __init__(
+        self,
+        renamer: object,
+        asset_folder_names: dict[str, dict[str, str]] | None = None,
+        mode: str = "auto",
+        debounce: float = WATCH_DEBOUNCE,
+        max_delay: float = WATCH_MAX_DELAY,
+        poll_interval: float = POLL_INTERVAL,
+    ):
+        self.renamer = renamer
+        self.asset_folder_names = asset_folder_names
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.source_directories = [Path(item) for item in renamer.source_directories]
+        self.watcher = create_watcher(
+            self.source_directories,
+            renamer.image_exts,
+            renamer.recursive,
+            mode,
+            poll_interval,
+        )
+        self.sources_by_name: dict[str, list[Path]] = {}
+        for path in sorted(renamer.source_stats, key=self._priority):
+            self.sources_by_name.setdefault(path.stem, []).append(path)
+        self._running = False
+
+    def run(self) -> None:
+        logger.info("Watching %s", ", ".join(map(str, self.source_directories)))
+        self._running = True
+        pending = set()
+        first_event = last_event = 0.0
+        try:
+            while self._running:
+                changed = self.watcher.wait(self.debounce if pending else 1.0)
+                if getattr(self.watcher, "overflowed", False):
+                    logger.warning(
+                        "Watch event queue overflowed, rescanning source directories"
+                    )
+                    self.watcher.overflowed = False
+                    changed |= self._list_sources()
+                now = time.monotonic()
+                if changed:
+                    if not pending:
+                        first_event = now
+                    pending |= changed
+                    last_event = now
+                if pending and (
+                    now - last_event >= self.debounce
+                    or now - first_event >= self.max_delay
+                ):
+                    self.process_changes(pending)
+                    pending = set()
+        finally:
+            self.watcher.close()
+
+    def stop(self) -> None:
+        self._running = False
+
+    def process_changes(self, changed_paths: set[Path]) -> None:
+        """
+        Update the known source files from the changed paths, then match and
+        copy the highest-priority source for every affected poster name.
+        """
+        deleted = set()
+        affected_names = set()
+        for path in changed_paths:
+            if self._update_source(path):
+                affected_names.add(path.stem)
+            elif path in self.renamer.source_stats:
+                del self.renamer.source_stats[path]
+                self._forget_source(path)
+                deleted.add(str(path))
+                affected_names.add(path.stem)
+
+        if deleted:
+            self.renamer.remove_sources_from_cache(deleted)
+
+        matched_files = {"collections": [], "movies": [], "shows": []}
+        for name in affected_names:
+            sources = self.sources_by_name.get(name)
+            if not sources:
+                continue
+            category = self.renamer.match_index.match(name)
+            if category:
+                matched_files[category].append(sources[0])
+
+        logger.info(
+            "Processing %s changed files, %s matched",
+            len(changed_paths),
+            sum(map(len, matched_files.values())),
+        )
+        if self.asset_folder_names is not None:
+            self.renamer.copy_rename_files_asset_folders(
+                matched_files, self.asset_folder_names
+            )
+        else:
+            self.renamer.copy_rename_files(matched_files)
+
+    def _update_source(self, path: Path) -> bool:
+        """
+        Record a new or modified source poster. Returns False when the path is
+        not (or no longer) a poster in a source directory.
+        """
+        if path.suffix.lower() not in self.renamer.image_exts:
+            return False
+        try:
+            path_stat = path.stat()
+        except OSError:
+            return False
+        if not stat.S_ISREG(path_stat.st_mode):
+            return False
+        is_new = path not in self.renamer.source_stats
+        self.renamer.source_stats[path] = path_stat
+        if is_new:
+            sources = self.sources_by_name.setdefault(path.stem, [])
+            sources.append(path)
+            sources.sort(key=self._priority)
+        return True
+
+    def _forget_source(self, path: Path) -> None:
+        sources = self.sources_by_name.get(path.stem, [])
+        if path in sources:
+            sources.remove(path)
+        if not sources:
+            self.sources_by_name.pop(path.stem, None)
+
+    def _priority(self, path: Path) -> int:
+        for index, directory in enumerate(self.source_directories):
+            if path.is_relative_to(directory):
+                return index
+        return len(self.source_directories)
+
+    def _list_sources(self) -> set[Path]:
+        failed = set()
+        scanned = scan_directories(
+            self.source_directories,
+            self.renamer.image_exts,
+            self.renamer.recursive,
+            failed,
+        )
+        paths = {path for files in scanned for path, _ in files}
+        if not failed:
+            # Known sources missing from the listing are checked as deletions,
+            # unless a directory could not be listed.
+            paths.update(self.renamer.source_stats)
+        return paths
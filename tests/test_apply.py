@@ -0,0 +1,125 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from daps_ui.plan import PlannedAction
+from daps_ui.poster_renamerr import PosterRenamerr
+
+
+@pytest.fixture
+def renamer(tmp_path):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "assets").mkdir()
+    renamer = PosterRenamerr(
+        tmp_path / "assets", [], False, tmp_path / "cache.db", copy_workers=1
+    )
+    yield renamer
+    renamer.cache.close()
+
+
+def write(path: Path, data: bytes, mtime_ns: int | None = None) -> Path:
+    path.write_bytes(data)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return path
+
+
+def apply(renamer: PosterRenamerr, source: Path, target: Path) -> PlannedAction:
+    """
+    Plan and apply one copy job, the way apply_plan does.
+    """
+    action = renamer._plan_action(source, target, os.path.lexists(target))
+    renamer._apply_action(action)
+    return action
+
+
+def test_modified_source_is_read_once(renamer, tmp_path, monkeypatch):
+    source = write(tmp_path / "src" / "Up (2009).jpg", b"old", 1_000_000_000)
+    target = tmp_path / "assets" / "Up (2009).jpg"
+    apply(renamer, source, target)
+
+    write(source, b"new", 2_000_000_000)
+    monkeypatch.setattr(
+        renamer, "hash_file", lambda path: pytest.fail(f"{path} hashed twice")
+    )
+    action = apply(renamer, source, target)
+
+    assert action.reason == "source modified"
+    assert target.read_bytes() == b"new"
+    assert renamer.metrics.counters["hashes_computed"] == 2
+    assert renamer.metrics.counters["files_replaced"] == 1
+
+
+def test_touched_source_with_same_contents_is_not_replaced(renamer, tmp_path):
+    source = write(tmp_path / "src" / "Up (2009).jpg", b"poster", 1_000_000_000)
+    target = tmp_path / "assets" / "Up (2009).jpg"
+    apply(renamer, source, target)
+    target_inode = target.stat().st_ino
+
+    write(source, b"poster", 2_000_000_000)
+    action = apply(renamer, source, target)
+
+    assert action.reason == "source modified"
+    assert target.stat().st_ino == target_inode
+    assert renamer.metrics.counters["cache_hits"] == 1
+    assert list(target.parent.glob(".*.tmp")) == []
+    assert apply(renamer, source, target).reason == "unchanged"
+
+
+def test_verify_hashes_does_not_stage_unchanged_sources(renamer, tmp_path):
+    source = write(tmp_path / "src" / "Up (2009).jpg", b"poster")
+    target = tmp_path / "assets" / "Up (2009).jpg"
+    apply(renamer, source, target)
+
+    renamer.verify_hashes = True
+    renamer.placer.stage = lambda *args, **kwargs: pytest.fail("staged a copy")
+    action = apply(renamer, source, target)
+
+    assert action.reason == "verify hash"
+    assert renamer.metrics.counters["cache_hits"] == 1
+    assert renamer.metrics.counters["errors"] == 0
+
+
+def test_changed_source_is_not_linked_without_dedupe(renamer, tmp_path):
+    first = write(tmp_path / "src" / "Heat (1995).jpg", b"same")
+    second = write(tmp_path / "src" / "Up (2009).jpg", b"diff", 1_000_000_000)
+    apply(renamer, first, tmp_path / "assets" / "Heat (1995).jpg")
+    apply(renamer, second, tmp_path / "assets" / "Up (2009).jpg")
+
+    # New contents behind an unchanged fingerprint, found by verify_hashes.
+    write(second, b"same", 1_000_000_000)
+    renamer.verify_hashes = True
+    apply(renamer, second, tmp_path / "assets" / "Up (2009).jpg")
+
+    target = tmp_path / "assets" / "Up (2009).jpg"
+    assert target.read_bytes() == b"same"
+    assert not os.path.samefile(target, tmp_path / "assets" / "Heat (1995).jpg")
+    assert renamer.metrics.counters["files_deduplicated"] == 0
+
+
+def test_duplicate_is_not_hardlinked_to_another_source(tmp_path):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "assets").mkdir()
+    renamer = PosterRenamerr(
+        tmp_path / "assets",
+        [],
+        False,
+        tmp_path / "cache.db",
+        copy_workers=1,
+        placement="hardlink",
+        dedupe=True,
+    )
+    try:
+        heat = write(tmp_path / "src" / "Heat (1995).jpg", b"same")
+        up = write(tmp_path / "src" / "Up (2009).jpg", b"same")
+        apply(renamer, heat, tmp_path / "assets" / "Heat (1995).jpg")
+        apply(renamer, up, tmp_path / "assets" / "Up (2009).jpg")
+    finally:
+        renamer.cache.close()
+
+    target = tmp_path / "assets" / "Up (2009).jpg"
+    assert os.path.samefile(tmp_path / "assets" / "Heat (1995).jpg", heat)
+    assert not os.path.samefile(target, heat)
+    heat.write_bytes(b"edit")
+    assert target.read_bytes() == b"same"
@@ -0,0 +1,44 @@
+import os
+from types import SimpleNamespace
+
+from daps_ui.cache import create_cache
+from daps_ui.cli import cache_prune
+
+ENTRY = {
+    "hash": "abc",
+    "algorithm": "sha256",
+    "source_path": "/src/Up (2009).jpg",
+    "fingerprint": [6, 1, 2, 3],
+}
+
+
+def test_read_only_cache_leaves_the_directory_unchanged(tmp_path):
+    cache = create_cache(tmp_path / "cache.json")
+    cache.set("/assets/Up (2009).jpg", ENTRY)
+    cache.commit()
+    cache.close()
+    before = sorted(os.listdir(tmp_path))
+
+    cache = create_cache(tmp_path / "cache.json", read_only=True)
+    try:
+        assert cache.get("/assets/Up (2009).jpg") == ENTRY
+    finally:
+        cache.close()
+
+    assert sorted(os.listdir(tmp_path)) == before
+
+
+def test_cache_prune_keeps_optimized_posters_without_a_copy_cache(tmp_path):
+    store_dir = tmp_path / "optimized"
+    (store_dir / "ab").mkdir(parents=True)
+    (store_dir / "ab" / "abcdef.webp").write_bytes(b"poster")
+    config = SimpleNamespace(
+        script_config={
+            "cache_file": str(tmp_path / "missing.json"),
+            "optimize_cache_dir": str(store_dir),
+        }
+    )
+
+    cache_prune(config)
+
+    assert (store_dir / "ab" / "abcdef.webp").exists()
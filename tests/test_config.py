@@ -0,0 +1,134 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from daps_ui.config import Config
+from daps_ui.metadata_cache import MetadataCache
+
+
+class StubInstance:
+    """
+    Stands in for Radarr/Sonarr: fetches /items from its base URL. The request
+    timeout is deliberately longer than the instance timeout, like a server
+    that keeps the connection alive without answering.
+    """
+
+    def __init__(self, base_url, api, timeout=None, session=None):
+        response = requests.get(f"{base_url}/items", timeout=10)
+        response.raise_for_status()
+        self.items = response.json()
+
+    def to_cache(self):
+        return {"items": self.items}
+
+    @classmethod
+    def from_cache(cls, data):
+        instance = cls.__new__(cls)
+        instance.items = data["items"]
+        return instance
+
+
+@pytest.fixture
+def servers():
+    release = threading.Event()
+    hits = {"healthy": 0, "slow": 0, "failing": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            name = self.server.name
+            hits[name] += 1
+            if name == "slow":
+                release.wait(5)
+            if name == "failing":
+                self.send_error(500)
+                return
+            body = json.dumps([f"{name} item"]).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    urls = {}
+    running = []
+    for name in hits:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        server.daemon_threads = True
+        server.name = name
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        urls[name] = f"http://127.0.0.1:{server.server_port}"
+        running.append(server)
+    yield urls, hits
+    release.set()
+    for server in running:
+        server.shutdown()
+        server.server_close()
+
+
+def make_config(tmp_path, urls):
+    lines = ["instances:", "  radarr:"]
+    for name, url in urls.items():
+        lines += [f"    {name}:", f"      url: {url}", "      api: key"]
+    lines += [
+        "poster_renamerr:",
+        f"  instances: [{', '.join(urls)}]",
+        "  instance_timeout: 0.5",
+        "  instance_retries: 0",
+    ]
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text("\n".join(lines) + "\n")
+    return Config("poster_renamerr", config_path)
+
+
+def test_slow_instance_falls_back_to_cache_when_its_timeout_expires(tmp_path, servers):
+    urls, hits = servers
+    config = make_config(tmp_path, urls)
+    metadata_cache = MetadataCache(tmp_path / "metadata", ttl=0)
+    metadata_cache.put("slow", {"url": urls["slow"]}, {"items": ["cached item"]})
+
+    started = time.monotonic()
+    radarr, sonarr = config.create_arr_instances(
+        StubInstance, StubInstance, metadata_cache
+    )
+    elapsed = time.monotonic() - started
+
+    assert elapsed < 2
+    assert sonarr == {}
+    assert list(radarr) == ["healthy", "slow"]
+    assert radarr["healthy"].items == ["healthy item"]
+    assert radarr["slow"].items == ["cached item"]
+    assert config.failed_instances == {"failing"}
+    assert hits == {"healthy": 1, "slow": 1, "failing": 1}
+    cached = metadata_cache.get("healthy", {"url": urls["healthy"]})
+    assert cached["data"] == {"items": ["healthy item"]}
+
+
+def test_instance_without_cache_is_recorded_as_failed_when_it_times_out(
+    tmp_path, servers
+):
+    urls, hits = servers
+    config = make_config(tmp_path, urls)
+
+    radarr, _ = config.create_arr_instances(StubInstance, StubInstance)
+
+    assert list(radarr) == ["healthy"]
+    assert config.failed_instances == {"slow", "failing"}
+
+
+def test_fresh_cache_entry_skips_the_instance(tmp_path, servers):
+    urls, hits = servers
+    config = make_config(tmp_path, {"healthy": urls["healthy"]})
+    metadata_cache = MetadataCache(tmp_path / "metadata", ttl=3600)
+    metadata_cache.put("healthy", {"url": urls["healthy"]}, {"items": ["cached"]})
+
+    radarr, _ = config.create_arr_instances(StubInstance, StubInstance, metadata_cache)
+
+    assert radarr["healthy"].items == ["cached"]
+    assert hits["healthy"] == 0
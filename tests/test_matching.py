@@ -0,0 +1,119 @@
+import pytest
+
+from daps_ui.catalog import MediaCatalog
+from daps_ui.matching import MatchIndex, MediaMatch, parse_title_key
+
+
+def index(fuzzy_cutoff: float | None = None, **names: list[str]) -> MatchIndex:
+    catalog = MediaCatalog()
+    for kind, kind_names in names.items():
+        catalog.update(kind, kind_names)
+    return MatchIndex(catalog, fuzzy_cutoff)
+
+
+def test_title_key_is_normalized():
+    assert parse_title_key("Amélie: Part II (2001) {tmdb-194}") == (
+        "amelie part ii",
+        2001,
+        (("tmdb", "194"),),
+    )
+    assert parse_title_key("Alien Collection", collection=True).title == "alien"
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        ("Up (2009)", "Up (2009)"),
+        ("up (2009)", "Up (2009)"),
+        ("Up", "Up (2009)"),
+        ("Up (2009) {tmdb-14160}", "Up (2009)"),
+        ("Upgrade (2018)", "Upgrade (2018)"),
+        ("Up (2010)", None),
+        ("Upgrade (2009)", None),
+    ],
+)
+def test_movies_match_by_title_and_year(name, expected):
+    media_match = index(movies=["Up (2009)", "Upgrade (2018)"]).resolve(name)
+    assert media_match == (expected and MediaMatch("movies", expected))
+
+
+def test_up_does_not_match_upgrade():
+    assert index(movies=["Upgrade (2018)"]).resolve("Up") is None
+
+
+def test_id_wins_over_title_and_year():
+    match_index = index(movies=["Heat (1995) {tmdb-949}", "Heat (1986) {tmdb-8}"])
+    assert match_index.resolve("Whatever (2000) {tmdb-8}") == MediaMatch(
+        "movies", "Heat (1986) {tmdb-8}"
+    )
+
+
+def test_poster_id_must_not_conflict():
+    match_index = index(movies=["Heat (1995) {tmdb-949}"])
+    assert match_index.resolve("Heat (1995) {tmdb-8}") is None
+    assert match_index.resolve("Heat (1995) {imdb-tt0113277}") == MediaMatch(
+        "movies", "Heat (1995) {tmdb-949}"
+    )
+
+
+def test_title_without_year_prefers_media_without_year():
+    match_index = index(shows=["Doctor Who", "Doctor Who (2005)"])
+    assert match_index.resolve("Doctor Who") == MediaMatch("shows", "Doctor Who")
+
+
+def test_ambiguous_title_is_reported_and_skipped():
+    match_index = index(movies=["Heat (1995)", "Heat (1986)"])
+    assert match_index.resolve("Heat") is None
+    assert match_index.ambiguous == {"Heat": ["Heat (1995)", "Heat (1986)"]}
+    assert match_index.resolve("Heat (1986)") == MediaMatch("movies", "Heat (1986)")
+
+
+def test_media_listed_by_several_instances_is_folded():
+    match_index = index(movies=["Up (2009)", "Up (2009) {tmdb-14160}"])
+    assert match_index.resolve("Up (2009)") == MediaMatch("movies", "Up (2009)")
+    assert match_index.ambiguous == {}
+
+
+def test_same_title_with_different_ids_is_not_folded():
+    match_index = index(shows=["Show {tvdb-1}", "Show {tvdb-2}"])
+    assert match_index.resolve("Show") is None
+    assert match_index.resolve("Show {tvdb-2}") == MediaMatch("shows", "Show {tvdb-2}")
+
+
+def test_collections_are_matched_first_and_without_suffix():
+    match_index = index(collections=["Alien"], movies=["Alien (1979)"])
+    assert match_index.resolve("Alien Collection") == MediaMatch("collections", "Alien")
+    assert match_index.resolve("Alien (1979)") == MediaMatch("movies", "Alien (1979)")
+
+
+def test_season_posters_match_their_show():
+    match_index = index(shows=["Severance (2022) {tvdb-371980}"])
+    for name in ("Severance (2022) - Season 1", "Severance (2022) - Specials"):
+        assert match_index.resolve(name) == MediaMatch(
+            "shows", "Severance (2022) {tvdb-371980}"
+        )
+
+
+def test_fuzzy_match_is_only_tried_with_a_cutoff():
+    names = {"movies": ["The Matrix (1999)", "Heat (1995)"]}
+    assert index(**names).resolve("The Matrx (1999)") is None
+
+    match_index = index(0.9, **names)
+    assert match_index.resolve("The Matrx (1999)") == MediaMatch(
+        "movies", "The Matrix (1999)", fuzzy=True
+    )
+    assert "The Matrx (1999)" in match_index.fuzzy_matches
+    assert match_index.resolve("The Matrx (2003)") is None
+
+
+def test_fuzzy_match_without_year_ranks_titles_sharing_the_first_word():
+    match_index = index(0.8, movies=["Blade Runner (1982)", "Runner Blade (1990)"])
+    assert match_index.resolve("Blade Runer") == MediaMatch(
+        "movies", "Blade Runner (1982)", fuzzy=True
+    )
+
+
+def test_fuzzy_match_with_a_tie_is_ambiguous():
+    match_index = index(0.7, movies=["Heat (1995)", "Beat (1995)"])
+    assert match_index.resolve("Seat (1995)") is None
+    assert match_index.ambiguous["Seat (1995)"] == ["Heat (1995)", "Beat (1995)"]
@@ -0,0 +1,102 @@
+import hashlib
+import os
+
+import pytest
+
+from daps_ui.placement import FilePlacer
+
+
+@pytest.fixture
+def source(tmp_path):
+    (tmp_path / "assets").mkdir()
+    source = tmp_path / "poster.jpg"
+    source.write_bytes(b"poster")
+    return source
+
+
+@pytest.mark.parametrize("mode", ["auto", "hardlink", "reflink", "kernel", "copy"])
+def test_every_mode_places_and_hashes_the_source(tmp_path, source, mode):
+    target = tmp_path / "assets" / "Poster.jpg"
+    hasher = hashlib.sha256()
+
+    staged = FilePlacer(mode).stage(source, target, hasher=hasher)
+    assert not target.exists()
+    staged.commit()
+
+    assert target.read_bytes() == b"poster"
+    assert hasher.hexdigest() == hashlib.sha256(b"poster").hexdigest()
+    assert list(target.parent.glob(".*.tmp")) == []
+
+
+def test_hardlink_mode_links_the_source(tmp_path, source):
+    target = tmp_path / "assets" / "Poster.jpg"
+    staged = FilePlacer("hardlink").stage(source, target)
+    staged.commit()
+
+    assert staged.method == "hardlink"
+    assert os.path.samefile(source, target)
+
+
+def test_target_linked_to_the_source_is_not_staged_again(tmp_path, source):
+    target = tmp_path / "assets" / "Poster.jpg"
+    os.link(source, target)
+    hasher = hashlib.sha256()
+
+    staged = FilePlacer("hardlink").stage(source, target, hasher=hasher)
+
+    assert staged.method == "same"
+    assert hasher.hexdigest() == hashlib.sha256(b"poster").hexdigest()
+
+
+def test_replacing_a_hardlinked_target_does_not_write_through(tmp_path, source):
+    target = tmp_path / "assets" / "Poster.jpg"
+    os.link(source, target)
+    new_source = tmp_path / "new.jpg"
+    new_source.write_bytes(b"new")
+
+    FilePlacer("copy").stage(new_source, target).commit()
+
+    assert target.read_bytes() == b"new"
+    assert source.read_bytes() == b"poster"
+
+
+def test_discard_removes_the_staged_file(tmp_path, source):
+    target = tmp_path / "assets" / "Poster.jpg"
+    staged = FilePlacer("copy").stage(source, target)
+    staged.discard()
+
+    assert not target.exists()
+    assert list(target.parent.iterdir()) == []
+
+
+def test_link_refuses_a_file_modified_since_its_stat(tmp_path, source):
+    existing = tmp_path / "assets" / "Up.jpg"
+    existing.write_bytes(b"poster")
+    existing_stat = existing.stat()
+    existing.write_bytes(b"edited poster")
+    placer = FilePlacer("hardlink")
+
+    assert (
+        placer.link(existing, tmp_path / "assets" / "Heat.jpg", existing_stat) is None
+    )
+    assert list(existing.parent.glob(".*.tmp")) == []
+
+    staged = placer.link(existing, tmp_path / "assets" / "Heat.jpg")
+    staged.commit()
+    assert staged.method == "hardlink"
+    assert os.path.samefile(existing, tmp_path / "assets" / "Heat.jpg")
+
+
+def test_link_without_a_usable_method_returns_none(tmp_path, source):
+    existing = tmp_path / "assets" / "Up.jpg"
+    existing.write_bytes(b"poster")
+
+    # tmpfs and most test filesystems have no reflinks.
+    staged = FilePlacer().link(
+        existing, tmp_path / "assets" / "Heat.jpg", methods=("reflink",)
+    )
+
+    if staged is not None:
+        staged.discard()
+        pytest.skip("reflinks are supported here")
+    assert list(existing.parent.glob(".*.tmp")) == []
@@ -0,0 +1,150 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from daps_ui.poster_renamerr import PosterRenamerr
+
+
+@pytest.fixture
+def renamer(tmp_path):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "assets").mkdir()
+    renamer = PosterRenamerr(
+        tmp_path / "assets", [], False, tmp_path / "cache.db", copy_workers=1
+    )
+    yield renamer
+    renamer.cache.close()
+
+
+def poster(tmp_path: Path, name: str, data: bytes = b"poster") -> Path:
+    path = tmp_path / "src" / name
+    path.write_bytes(data)
+    os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+    return path
+
+
+def actions(plan) -> list[tuple[str, str, str]]:
+    return [
+        (action.action, action.target.name, action.reason) for action in plan.actions
+    ]
+
+
+def test_new_and_unchanged_targets(renamer, tmp_path):
+    source = poster(tmp_path, "Up (2009).jpg")
+    jobs = [(source, tmp_path / "assets", source.name)]
+    plan = renamer.plan_copy_jobs(jobs)
+    assert actions(plan) == [("copy", source.name, "new target")]
+
+    renamer.apply_plan(plan)
+    assert actions(renamer.plan_copy_jobs(jobs)) == [("skip", source.name, "unchanged")]
+
+
+def test_replace_reasons(renamer, tmp_path):
+    source = poster(tmp_path, "Up (2009).jpg")
+    other = poster(tmp_path, "Up (2009).png")
+    target = tmp_path / "assets" / "Up (2009).jpg"
+    jobs = [(source, target.parent, target.name)]
+
+    target.write_bytes(b"by hand")
+    assert actions(renamer.plan_copy_jobs(jobs)) == [
+        ("replace", target.name, "target not in cache")
+    ]
+
+    renamer.apply_plan(renamer.plan_copy_jobs([(other, target.parent, target.name)]))
+    assert actions(renamer.plan_copy_jobs(jobs)) == [
+        ("replace", target.name, f"source changed from {other}")
+    ]
+
+    renamer.apply_plan(renamer.plan_copy_jobs(jobs))
+    os.utime(source, ns=(2_000_000_000, 2_000_000_000))
+    assert actions(renamer.plan_copy_jobs(jobs)) == [
+        ("replace", target.name, "source modified")
+    ]
+
+    renamer.apply_plan(renamer.plan_copy_jobs(jobs))
+    renamer.verify_hashes = True
+    assert actions(renamer.plan_copy_jobs(jobs)) == [
+        ("replace", target.name, "verify hash")
+    ]
+
+    target.unlink()
+    assert actions(renamer.plan_copy_jobs(jobs)) == [
+        ("copy", target.name, "target missing")
+    ]
+
+
+def test_first_source_of_a_target_wins(renamer, tmp_path):
+    first = poster(tmp_path, "Up (2009).jpg")
+    second = poster(tmp_path, "Up.jpg")
+    plan = renamer.plan_copy_jobs(
+        [
+            (first, tmp_path / "assets", "Up (2009).jpg"),
+            (second, tmp_path / "assets", "Up (2009).jpg"),
+        ]
+    )
+    assert actions(plan) == [
+        ("copy", "Up (2009).jpg", "new target"),
+        ("skip", "Up (2009).jpg", f"already provided by {first}"),
+    ]
+
+
+def test_lone_targets_are_not_listed(renamer, tmp_path, monkeypatch):
+    listed = []
+    monkeypatch.setattr(renamer, "_list_target_dir", listed.append)
+    jobs = []
+    for name in ("Up (2009)", "Heat (1995)"):
+        (tmp_path / "assets" / name).mkdir()
+        jobs.append(
+            (poster(tmp_path, f"{name}.jpg"), tmp_path / "assets" / name, "Poster.jpg")
+        )
+    (tmp_path / "assets" / "Up (2009)" / "Poster.jpg").write_bytes(b"by hand")
+
+    plan = renamer.plan_copy_jobs(jobs)
+
+    assert listed == []
+    assert actions(plan) == [
+        ("replace", "Poster.jpg", "target not in cache"),
+        ("copy", "Poster.jpg", "new target"),
+    ]
+
+
+def test_deleted_source_is_forgotten_or_deleted(renamer, tmp_path):
+    source = poster(tmp_path, "Up (2009).jpg")
+    target = tmp_path / "assets" / source.name
+    renamer.apply_plan(renamer.plan_copy_jobs([(source, target.parent, source.name)]))
+
+    assert actions(renamer.plan_copy_jobs([], set())) == [
+        ("forget", source.name, "source no longer exists")
+    ]
+    renamer.remove_orphans = True
+    plan = renamer.plan_copy_jobs([], set())
+    assert actions(plan) == [("delete", source.name, "source no longer exists")]
+
+    renamer.apply_plan(plan)
+    assert not target.exists()
+    assert renamer.cache.get(str(target)) is None
+
+
+def test_directory_with_several_targets_is_listed_once(renamer, tmp_path, monkeypatch):
+    listed = []
+    list_target_dir = renamer._list_target_dir
+
+    def list_once(target_dir):
+        listed.append(target_dir)
+        return list_target_dir(target_dir)
+
+    monkeypatch.setattr(renamer, "_list_target_dir", list_once)
+    jobs = [
+        (source, tmp_path / "assets", source.name)
+        for source in (poster(tmp_path, "Up (2009).jpg"), poster(tmp_path, "Heat.jpg"))
+    ]
+    (tmp_path / "assets" / "Heat.jpg").write_bytes(b"by hand")
+
+    plan = renamer.plan_copy_jobs(jobs)
+
+    assert listed == [tmp_path / "assets"]
+    assert actions(plan) == [
+        ("copy", "Up (2009).jpg", "new target"),
+        ("replace", "Heat.jpg", "target not in cache"),
+    ]
@@ -0,0 +1,75 @@
+import time
+import xml.etree.ElementTree as ElementTree
+from types import SimpleNamespace
+
+from daps_ui.poster_renamerr import FULL_SYNC_INTERVAL, Server
+
+
+class StubPlex:
+    """
+    Answers collection queries of one movie library from (ratingKey, title,
+    updatedAt) tuples, honouring the updatedAt>> filter and paging headers.
+    """
+
+    def __init__(self, collections: list[tuple[str, str, int]]):
+        self.collections = collections
+        self.library = SimpleNamespace(
+            section=lambda name: SimpleNamespace(type="movie", key=1)
+        )
+        self.filtered_queries = 0
+
+    def query(self, path: str, headers: dict, params: dict) -> ElementTree.Element:
+        updated_after = params.get("updatedAt>>")
+        if updated_after is not None:
+            self.filtered_queries += 1
+        matching = [
+            (key, title)
+            for key, title, updated_at in self.collections
+            if updated_after is None or updated_at > updated_after
+        ]
+        start = int(headers["X-Plex-Container-Start"])
+        size = int(headers["X-Plex-Container-Size"])
+        container = ElementTree.Element("MediaContainer", totalSize=str(len(matching)))
+        for key, title in matching[start : start + size]:
+            ElementTree.SubElement(container, "Directory", ratingKey=key, title=title)
+        return container
+
+
+def fetch(plex: StubPlex, cached_library: dict) -> dict:
+    server = Server.__new__(Server)
+    server.plex = plex
+    return server._fetch_library_collections("Movies", cached_library)
+
+
+def cached(collections: dict[str, str], full_synced_at: int) -> dict:
+    synced_at = int(time.time()) - 60
+    return {
+        "type": "movie",
+        "collections": collections,
+        "synced_at": synced_at,
+        "full_synced_at": full_synced_at,
+    }
+
+
+def test_recent_full_fetch_only_syncs_changes():
+    now = int(time.time())
+    plex = StubPlex([("1", "Alien", now - 7200), ("2", "Heat", now)])
+    library = fetch(plex, cached({"1": "Alien", "2": "Old Heat"}, now - 60))
+
+    assert library["collections"] == {"1": "Alien", "2": "Heat"}
+    assert plex.filtered_queries == 1
+    assert library["full_synced_at"] == now - 60
+
+
+def test_stale_full_fetch_drops_collections_deleted_since():
+    # "2" was deleted and "3" restored with an old updatedAt: the merged count
+    # still matches, so only a full fetch notices.
+    now = int(time.time())
+    plex = StubPlex([("1", "Alien", now - 7200), ("3", "Up", now - 7200)])
+    library = fetch(
+        plex, cached({"1": "Alien", "2": "Heat"}, now - FULL_SYNC_INTERVAL - 1)
+    )
+
+    assert library["collections"] == {"1": "Alien", "3": "Up"}
+    assert plex.filtered_queries == 0
+    assert library["full_synced_at"] >= now
@@ -0,0 +1,130 @@
+from pathlib import Path
+
+import pytest
+
+from daps_ui.catalog import MediaCatalog
+from daps_ui.pipeline import StreamingPipeline
+from daps_ui.poster_renamerr import PosterRenamerr
+
+MOVIE = "Up (2009) {tmdb-1}"
+
+
+@pytest.fixture
+def library(tmp_path):
+    source_dir = tmp_path / "src"
+    source_dir.mkdir()
+    (source_dir / f"{MOVIE}.jpg").write_bytes(b"poster")
+    catalog = MediaCatalog()
+    catalog.update("movies", [MOVIE])
+    return tmp_path, source_dir, catalog
+
+
+def sync(root: Path, source_dir: Path, catalog: MediaCatalog) -> PosterRenamerr:
+    renamer = PosterRenamerr(
+        root / "assets",
+        [str(source_dir)],
+        True,
+        root / "cache.db",
+        copy_workers=1,
+        remove_orphans=True,
+    )
+    try:
+        asset_folder_names = renamer.create_asset_directories(catalog)
+        source_files = renamer.get_source_files()
+        matched_files = renamer.match_files_with_media(source_files, catalog)
+        renamer.apply_plan(
+            renamer.plan(matched_files, asset_folder_names, source_files)
+        )
+    finally:
+        renamer.cache.close()
+    return renamer
+
+
+def test_unreadable_source_dir_does_not_remove_its_posters(library):
+    root, source_dir, catalog = library
+    target = root / "assets" / MOVIE / "Poster.jpg"
+    sync(root, source_dir, catalog)
+    assert target.read_bytes() == b"poster"
+
+    source_dir.rename(root / "src-moved")
+    renamer = sync(root, source_dir, catalog)
+
+    assert renamer.failed_sources == {str(source_dir)}
+    assert renamer.metrics.counters["files_removed"] == 0
+    assert target.read_bytes() == b"poster"
+
+
+def test_unreadable_source_dir_does_not_remove_posters_in_stream_mode(library):
+    root, source_dir, catalog = library
+    target = root / "assets" / MOVIE / "Poster.jpg"
+    sync(root, source_dir, catalog)
+
+    source_dir.rename(root / "src-moved")
+    renamer = PosterRenamerr(
+        root / "assets",
+        [str(source_dir)],
+        True,
+        root / "cache.db",
+        copy_workers=1,
+        remove_orphans=True,
+    )
+    try:
+        asset_folder_names = renamer.create_asset_directories(catalog)
+        pipeline = StreamingPipeline(renamer, catalog, asset_folder_names)
+        pipeline.run()
+        renamer.prune_cache_sources(
+            pipeline.source_file_paths, pipeline.claimed_targets
+        )
+    finally:
+        renamer.cache.close()
+
+    assert renamer.failed_sources == {str(source_dir)}
+    assert target.read_bytes() == b"poster"
+
+
+def test_deleted_source_still_removes_its_poster(library):
+    root, source_dir, catalog = library
+    target = root / "assets" / MOVIE / "Poster.jpg"
+    sync(root, source_dir, catalog)
+
+    (source_dir / f"{MOVIE}.jpg").unlink()
+    renamer = sync(root, source_dir, catalog)
+
+    assert renamer.failed_sources == set()
+    assert renamer.metrics.counters["files_removed"] == 1
+    assert not target.exists()
+
+
+def test_shows_sharing_a_title_keep_their_asset_folders(tmp_path):
+    catalog = MediaCatalog()
+    catalog.update("shows", ["Show {tvdb-1}", "Show {tvdb-2}"])
+    (tmp_path / "assets" / "Show {tvdb-2}").mkdir(parents=True)
+    (tmp_path / "assets" / "Show {tvdb-2}" / "Poster.jpg").write_bytes(b"poster")
+    renamer = PosterRenamerr(
+        tmp_path / "assets", [], True, tmp_path / "cache.db", copy_workers=1
+    )
+    try:
+        renamer.create_asset_directories(catalog, orphans="prune")
+    finally:
+        renamer.cache.close()
+
+    assert (tmp_path / "assets" / "Show {tvdb-1}").is_dir()
+    assert (tmp_path / "assets" / "Show {tvdb-2}" / "Poster.jpg").exists()
+
+
+def test_show_poster_goes_to_the_folder_of_its_id(tmp_path):
+    source_dir = tmp_path / "src"
+    source_dir.mkdir()
+    (source_dir / "Show {tvdb-2}.jpg").write_bytes(b"show")
+    (source_dir / "Show {tvdb-2} - Season 1.jpg").write_bytes(b"season")
+    catalog = MediaCatalog()
+    catalog.update("shows", ["Show {tvdb-1}", "Show {tvdb-2}"])
+    sync(tmp_path, source_dir, catalog)
+
+    assert (
+        tmp_path / "assets" / "Show {tvdb-2}" / "Poster.jpg"
+    ).read_bytes() == b"show"
+    assert (
+        tmp_path / "assets" / "Show {tvdb-2}" / "Season01.jpg"
+    ).read_bytes() == b"season"
+    assert not any((tmp_path / "assets" / "Show {tvdb-1}").iterdir())
@@ -0,0 +1,57 @@
+from daps_ui.catalog import MediaCatalog
+from daps_ui.poster_renamerr import PosterRenamerr
+from daps_ui.watcher import PollingWatcher, PosterWatcher
+
+MOVIE = "Up (2009)"
+
+
+def test_deleted_poster_falls_back_to_the_next_source_dir(tmp_path):
+    first_dir = tmp_path / "a"
+    second_dir = tmp_path / "b"
+    for source_dir, data in ((first_dir, b"A"), (second_dir, b"B")):
+        source_dir.mkdir()
+        (source_dir / f"{MOVIE}.jpg").write_bytes(data)
+    (tmp_path / "assets").mkdir()
+    catalog = MediaCatalog()
+    catalog.update("movies", [MOVIE])
+    renamer = PosterRenamerr(
+        tmp_path / "assets",
+        [str(first_dir), str(second_dir)],
+        False,
+        tmp_path / "cache.db",
+        copy_workers=1,
+        remove_orphans=True,
+    )
+    try:
+        source_files = renamer.get_source_files()
+        matched_files = renamer.match_files_with_media(source_files, catalog)
+        renamer.apply_plan(renamer.plan(matched_files, None, source_files))
+        target = tmp_path / "assets" / f"{MOVIE}.jpg"
+        assert target.read_bytes() == b"A"
+
+        watcher = PosterWatcher(renamer, mode="poll")
+        (first_dir / f"{MOVIE}.jpg").unlink()
+        watcher.process_changes({first_dir / f"{MOVIE}.jpg"})
+        watcher.watcher.close()
+    finally:
+        renamer.cache.close()
+
+    assert target.read_bytes() == b"B"
+
+
+def test_polling_rescans_once_per_interval(tmp_path, monkeypatch):
+    watcher = PollingWatcher([tmp_path], {".jpg"}, interval=60)
+    scans = []
+
+    def scan(failed=None):
+        scans.append(1)
+        return {}
+
+    monkeypatch.setattr(watcher, "_scan", scan)
+    for _ in range(3):
+        assert watcher.wait(0.01) == set()
+    assert scans == []
+
+    watcher.interval = 0
+    watcher.wait(0.01)
+    assert scans == [1]